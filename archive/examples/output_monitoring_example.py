@@ -3,7 +3,8 @@ Example demonstrating real-time output monitoring for long-running processes.
 """
 import sys
 import os
-import time
+import re
+import threading
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -11,6 +12,52 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.ai_agency_v2.terminal_manager import TerminalManager
 from src.ai_agency_v2.process import OutputType
 
+# Case-insensitive matchers, so the handler doesn't lowercase every line
+_ERR_RE = re.compile("error", re.IGNORECASE)
+_WARN_RE = re.compile("warning", re.IGNORECASE)
+
+# Line prefixes indexed by OutputType, encoded once for the console's byte buffer
+_PREFIXES = ("📝 ".encode(), "❌ ".encode(), "🔧 ".encode())
+
+class BufferedConsole:
+    """Collects output lines and writes them to stdout in batches instead of one print per line."""
+    def __init__(self, interval: float = 0.02, max_buffered: int = 4096):
+        self.buf = bytearray()
+        self.interval = interval
+        self.max_buffered = max_buffered
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def write(self, data: bytes) -> None:
+        with self._lock:
+            self.buf += data
+            if len(self.buf) > self.max_buffered or self._closed.is_set():
+                self._write_buffered()
+    
+    def flush(self) -> None:
+        with self._lock:
+            self._write_buffered()
+    
+    def _write_buffered(self) -> None:
+        if self.buf:
+            # Flush pending print() output first so lines stay in order
+            sys.stdout.flush()
+            sys.stdout.buffer.write(self.buf)
+            sys.stdout.buffer.flush()
+            self.buf.clear()
+    
+    def _run(self) -> None:
+        while not self._closed.wait(self.interval):
+            self.flush()
+    
+    def close(self) -> None:
+        """Stop the flush thread; later writes go straight to stdout."""
+        self._closed.set()
+        self._thread.join()
+        self.flush()
+
 def main():
     # Create the terminal manager
     manager = TerminalManager(
@@ -21,24 +68,23 @@ def main():
     
     # Example: Using real-time output monitoring with JavaScript development server
     
+    console = BufferedConsole()
+    
     # Create a real-time output handler
     def real_time_output_handler(line, output_type, process_id):
-        prefix = {
-            OutputType.STDOUT: "📝",
-            OutputType.STDERR: "❌",
-            OutputType.SYSTEM: "🔧"
-        }.get(output_type, "?")
+        prefix = _PREFIXES[output_type]
+        text = line.strip().encode()
         
         # You could filter or process output here
-        if output_type == OutputType.STDERR and "error" in line.lower():
-            print(f"\033[91m{prefix} ERROR: {line.strip()}\033[0m")  # Red for errors
+        if output_type == OutputType.STDERR and _ERR_RE.search(line):
+            console.write(b"\033[91m" + prefix + b"ERROR: " + text + b"\033[0m\n")  # Red for errors
         elif output_type == OutputType.STDOUT:
-            if "warning" in line.lower():
-                print(f"\033[93m{prefix} {line.strip()}\033[0m")  # Yellow for warnings
+            if _WARN_RE.search(line):
+                console.write(b"\033[93m" + prefix + text + b"\033[0m\n")  # Yellow for warnings
             else:
-                print(f"\033[92m{prefix} {line.strip()}\033[0m")  # Green for regular output
+                console.write(b"\033[92m" + prefix + text + b"\033[0m\n")  # Green for regular output
         else:
-            print(f"{prefix} {line.strip()}")
+            console.write(prefix + text + b"\n")
     
     # Create a terminal
     terminal = manager.create_terminal()
@@ -63,7 +109,7 @@ def main():
         output_callback=real_time_output_handler
     )
     
-    process_id = result["process_id"]
+    process_id = result.process_id
     print(f"Started background process with ID: {process_id}")
     
     # Wait for the process to finish or user interrupt
@@ -72,17 +118,19 @@ def main():
         process = terminal_obj.get_process(process_id)
         
         print("Press Ctrl+C to stop the server...")
-        while process.is_running():
-            time.sleep(0.1)
+        process.wait()
             
+        console.flush()
         print(f"Process completed with exit code: {process.exit_code}")
         
     except KeyboardInterrupt:
+        console.flush()
         print("\nStopping server...")
         terminal_obj.kill_process(process_id)
         print("Server stopped.")
     
     # Clean up
+    console.close()
     print("Cleaning up...")
     manager.delete_terminal(terminal.terminal_id)
     print("Done.")
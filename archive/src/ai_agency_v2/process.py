@@ -1,19 +1,33 @@
 """
 Process management module for handling long-running processes
 """
+import enum
+import itertools
 import os
+import selectors
+import shlex
 import signal
 import subprocess
 import threading
 import time
+import uuid
 import logging
-import datetime
-from typing import Dict, Any, Optional, Callable, Tuple, List, Union
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, Tuple
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Shared by all processes to run added output listeners, so a slow listener doesn't stall output collection
+_LISTENER_POOL = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="proc-listener")
+
+# Process ids are a counter behind a random per-interpreter prefix; terminal histories that keep
+# process ids are saved and restored, so ids must not repeat across restarts
+_PROCESS_ID_PREFIX = uuid.uuid4().hex[:8]
+_PROCESS_ID_COUNTER = itertools.count(1)
+
 class ProcessStatus:
     """Process status constants"""
     RUNNING = "running"
@@ -23,16 +37,25 @@ class ProcessStatus:
     UNKNOWN = "unknown"
 
 # Output stream types
-class OutputType:
-    """Output stream type constants"""
-    STDOUT = "stdout"
-    STDERR = "stderr"
-    SYSTEM = "system"  # For system messages (not from process)
+class OutputType(enum.IntEnum):
+    """Output stream type constants; small ints so handlers can index tuples by them"""
+    STDOUT = 0
+    STDERR = 1
+    SYSTEM = 2  # For system messages (not from process)
+    
+    def __str__(self) -> str:
+        # Print as the old string values ("stdout", ...) in logs and messages
+        return self.name.lower()
 
 class Process:
     """
     Represents a single running process that can be managed, including long-running processes.
     """
+    # Seconds between exit checks while waiting for output, when pidfds aren't available
+    POLL_INTERVAL = 0.1
+    # Bytes of stdout/stderr kept per stream; older output is dropped beyond this
+    OUTPUT_BUFFER_LIMIT = 1 << 20
+    
     def __init__(
         self,
         command: str,
@@ -42,6 +65,7 @@ class Process:
         background: bool = False,
         on_output: Optional[Callable[[str, str, str], None]] = None,
         on_exit: Optional[Callable[[int], None]] = None,
+        base_env: Optional[Dict[str, str]] = None,
     ):
         """
         Initialize a new Process.
@@ -55,31 +79,44 @@ class Process:
             on_output: Callback function for process output. 
                        Signature: fn(line: str, output_type: str, process_id: str)
             on_exit: Callback function for process exit
+            base_env: Prebuilt environment (os.environ merged with env_vars) that can be shared
+                      between processes; built from env_vars on start if not provided
         """
-        from uuid import uuid4
-        
-        self.process_id = process_id or str(uuid4())
+        self.process_id = process_id or f"p{_PROCESS_ID_PREFIX}-{next(_PROCESS_ID_COUNTER)}"
         self.command = command
         self.working_dir = working_dir
         self.env_vars = env_vars or {}
+        self.base_env = base_env
+        # PYTHONUNBUFFERED=1 is added for Python commands so their output isn't held back
+        self._is_python = "python" in command.lower()
         self.background = background
         self.on_output = on_output
         self.on_exit = on_exit
         
         self.process: Optional[subprocess.Popen] = None
+        # Process group id; the process leads its own group via setsid
+        self._pgid: Optional[int] = None
         self.status = ProcessStatus.STOPPED
         self.exit_code: Optional[int] = None
-        self.output_buffer = []
-        self.error_buffer = []
+        # Raw output bytes, decoded only when read
+        self.output_buffer = bytearray()
+        self.error_buffer = bytearray()
         self.start_time: Optional[float] = None
         self.end_time: Optional[float] = None
         
-        # List of additional output listeners added after initialization
-        self._output_listeners: List[Callable[[str, str, str], None]] = []
+        # Additional output listeners added after initialization; replaced rather than mutated
+        # so the pump thread can iterate it without a lock
+        self._output_listeners: Tuple[Callable[[str, str, str], None], ...] = ()
+        # Lines waiting to be delivered to the listeners, drained in order by one pool task at a time
+        self._listener_queue = deque()
+        self._listener_lock = threading.Lock()
+        self._listener_draining = False
+        self._select_notify()
         
-        self._output_thread = None
-        self._error_thread = None
-        self._monitor_thread = None
+        # Single thread that reads stdout and stderr and reports the exit
+        self._pump_thread = None
+        # Set once the process has exited and all of its output has been collected
+        self._exit_event = threading.Event()
         self._stopping = False
         
         logger.info(f"Process {self.process_id} created for command: {command}")
@@ -90,10 +127,11 @@ class Process:
         
         Args:
             listener: Callback function that takes (line, output_type, process_id)
-                     where output_type is 'stdout' or 'stderr'
+                     where output_type is an OutputType
         """
         if listener not in self._output_listeners:
-            self._output_listeners.append(listener)
+            self._output_listeners = self._output_listeners + (listener,)
+            self._select_notify()
     
     def remove_output_listener(self, listener: Callable[[str, str, str], None]) -> bool:
         """
@@ -106,28 +144,66 @@ class Process:
             True if listener was found and removed, False otherwise
         """
         if listener in self._output_listeners:
-            self._output_listeners.remove(listener)
+            self._output_listeners = tuple(l for l in self._output_listeners if l != listener)
+            self._select_notify()
             return True
         return False
     
-    def _notify_output(self, line: str, output_type: str) -> None:
+    def _select_notify(self) -> None:
+        """Bind _notify_output to the cheapest implementation for the current callbacks"""
+        if self._output_listeners:
+            self._notify_output = self._notify_all
+        elif self.on_output:
+            self._notify_output = self._notify_on_output
+        else:
+            self._notify_output = self._notify_none
+    
+    def _notify_none(self, line: str, output_type: str) -> None:
+        """Nobody is listening"""
+    
+    def _notify_on_output(self, line: str, output_type: str) -> None:
+        """Notify only the main output callback"""
+        self.on_output(line, output_type, self.process_id)
+    
+    def _notify_all(self, line: str, output_type: str) -> None:
         """
         Notify all listeners of new output.
         
         Args:
             line: The output line
-            output_type: Type of output ('stdout' or 'stderr')
+            output_type: Type of output (an OutputType)
         """
+        process_id = self.process_id
+        
         # Call the main output callback if defined
-        if self.on_output:
-            self.on_output(line, output_type, self.process_id)
+        on_output = self.on_output
+        if on_output:
+            on_output(line, output_type, process_id)
             
-        # Call all registered listeners
-        for listener in self._output_listeners:
-            try:
-                listener(line, output_type, self.process_id)
-            except Exception as e:
-                logger.error(f"Error in output listener: {str(e)}")
+        # Hand the line to the registered listeners on the shared pool
+        listeners = self._output_listeners
+        if listeners:
+            with self._listener_lock:
+                self._listener_queue.append((listeners, line, output_type))
+                if self._listener_draining:
+                    return
+                self._listener_draining = True
+            _LISTENER_POOL.submit(self._drain_listener_queue)
+    
+    def _drain_listener_queue(self) -> None:
+        """Deliver queued lines to listeners, keeping them in output order"""
+        while True:
+            with self._listener_lock:
+                if not self._listener_queue:
+                    self._listener_draining = False
+                    return
+                listeners, line, output_type = self._listener_queue.popleft()
+            
+            for listener in listeners:
+                try:
+                    listener(line, output_type, self.process_id)
+                except Exception as e:
+                    logger.error(f"Error in output listener: {str(e)}")
     
     def start(self) -> bool:
         """
@@ -141,14 +217,17 @@ class Process:
             return False
             
         try:
-            # Create a new process group so we can manage it as a group
-            env = {**os.environ, **self.env_vars}
+            # None inherits this process's environment without copying it
+            env = self.base_env
+            if env is None and self.env_vars:
+                env = {**os.environ, **self.env_vars}
             
             # Add PYTHONUNBUFFERED=1 to force unbuffered output for Python processes
-            if "python" in self.command.lower():
-                env["PYTHONUNBUFFERED"] = "1"
+            if self._is_python:
+                env = {**(os.environ if env is None else env), "PYTHONUNBUFFERED": "1"}
             
-            # Start the process - use universal_newlines instead of text for better compatibility
+            # Start the process with unbuffered binary pipes; output is read in blocks and
+            # split into lines by _read_output
             self.process = subprocess.Popen(
                 self.command,
                 shell=True,
@@ -157,38 +236,29 @@ class Process:
                 stdin=subprocess.PIPE if not self.background else subprocess.DEVNULL,
                 cwd=self.working_dir,
                 env=env,
-                universal_newlines=True,  # Use universal_newlines for better cross-platform handling
-                bufsize=1,  # Line buffering - smaller buffer size for more real-time output
-                preexec_fn=os.setsid  # Create a new process group
+                bufsize=0,
+                start_new_session=True  # Create a new process group
             )
             
+            # setsid makes the process its own group leader, so the group id is its pid
+            self._pgid = self.process.pid
             self.start_time = time.time()
             self.status = ProcessStatus.RUNNING
             self._stopping = False
+            self._exit_event.clear()
+            # on_output may have been replaced since construction
+            self._select_notify()
             
             # Notify of process start via system message
             start_msg = f"Process started with PID {self.process.pid}"
             self._notify_output(start_msg, OutputType.SYSTEM)
             
-            # Start threads to collect output
-            self._output_thread = threading.Thread(
-                target=self._read_output,
-                args=(self.process.stdout, self.output_buffer, OutputType.STDOUT),
-                daemon=True
-            )
-            self._error_thread = threading.Thread(
-                target=self._read_output,
-                args=(self.process.stderr, self.error_buffer, OutputType.STDERR),
-                daemon=True
-            )
-            self._monitor_thread = threading.Thread(
-                target=self._monitor_process,
+            # Start the thread that collects output and watches for exit
+            self._pump_thread = threading.Thread(
+                target=self._pump,
                 daemon=True
             )
-            
-            self._output_thread.start()
-            self._error_thread.start()
-            self._monitor_thread.start()
+            self._pump_thread.start()
             
             logger.info(f"Process {self.process_id} started with PID {self.process.pid}")
             return True
@@ -200,46 +270,119 @@ class Process:
             self.status = ProcessStatus.FAILED
             return False
 
-    def _read_output(self, pipe, buffer, output_type):
-        """Read output from the process and store in buffer"""
-        while self.process and self.status == ProcessStatus.RUNNING:
-            try:
-                # Use read(1) to read character by character for real-time output
-                # This is slower but more responsive than readline()
-                line = ""
-                char = pipe.read(1)
-                
-                # If pipe is closed, break
-                if not char:
+    def _pump(self):
+        """Read stdout and stderr from one thread and update status when the process exits"""
+        selector = selectors.DefaultSelector()
+        for pipe, buffer, output_type in (
+            (self.process.stdout, self.output_buffer, OutputType.STDOUT),
+            (self.process.stderr, self.error_buffer, OutputType.STDERR),
+        ):
+            # Each stream keeps the bytes after its last newline until the rest of the line arrives
+            selector.register(pipe.fileno(), selectors.EVENT_READ, (buffer, output_type, bytearray()))
+        
+        # A pidfd becomes readable when the process exits, so exit is noticed without polling (Linux 5.3+)
+        pidfd = self._open_pidfd()
+        if pidfd is not None:
+            selector.register(pidfd, selectors.EVENT_READ, None)
+        
+        exit_code = None
+        try:
+            while selector.get_map():
+                if exit_code is not None:
+                    timeout = 0
+                else:
+                    timeout = None if pidfd is not None else self.POLL_INTERVAL
+                ready = selector.select(timeout)
+                if not ready and exit_code is not None:
+                    # Exited and nothing left to read; pipes may still be held open by children
                     break
-                    
-                # Collect characters until we find a newline
-                while char and char != '\n':
-                    line += char
-                    char = pipe.read(1)
-                    if not char:  # End of file
-                        break
-                
-                # Add newline if we found one
-                if char == '\n':
-                    line += '\n'
-                
-                if line:  # Only process if we have some text
-                    buffer.append(line)
-                    self._notify_output(line, output_type)
-            except (BrokenPipeError, IOError, ValueError) as e:
-                # Pipe was closed or process ended
-                logger.debug(f"Pipe error in process {self.process_id}: {str(e)}")
-                break
-                
-        logger.debug(f"Read output thread ending for process {self.process_id} (type: {output_type})")
+                for key, _ in ready:
+                    if key.data is None:
+                        selector.unregister(pidfd)
+                        # Reap through Popen so its returncode stays in sync; this doesn't block
+                        exit_code = self.process.wait()
+                    else:
+                        self._read_output(selector, key)
+                if exit_code is None and pidfd is None:
+                    exit_code = self.process.poll()
+        finally:
+            # Flush final lines that had no trailing newline
+            for key in list(selector.get_map().values()):
+                buffer, output_type, pending = key.data
+                self._flush_pending(pending, buffer, output_type)
+            selector.close()
+            if pidfd is not None:
+                os.close(pidfd)
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Output pump ending for process {self.process_id}")
+        if exit_code is None:
+            exit_code = self.process.wait()
+        self._handle_exit(exit_code)
     
-    def _monitor_process(self):
-        """Monitor the process and update status when it exits"""
-        if not self.process:
+    def _open_pidfd(self) -> Optional[int]:
+        """Open a pidfd for the process, or return None if the platform doesn't support it"""
+        if not hasattr(os, "pidfd_open"):
+            return None
+        try:
+            return os.pidfd_open(self.process.pid)
+        except OSError as e:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"pidfd_open unavailable for process {self.process_id}: {str(e)}")
+            return None
+    
+    def _read_output(self, selector, key):
+        """Read a block from a ready pipe and store it in its buffer line by line"""
+        buffer, output_type, pending = key.data
+        try:
+            # Returns as soon as any output is available, up to a full block
+            chunk = os.read(key.fd, 65536)
+        except (BrokenPipeError, IOError, ValueError) as e:
+            # Pipe was closed or process ended
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Pipe error in process {self.process_id}: {str(e)}")
+            chunk = b""
+        
+        # If pipe is closed, stop watching it
+        if not chunk:
+            selector.unregister(key.fd)
+            self._flush_pending(pending, buffer, output_type)
             return
-            
-        exit_code = self.process.wait()
+        
+        pending += chunk
+        # Translate \r\n and a lone \r to \n here rather than in a text-mode pipe, so progress output
+        # that redraws its line with \r still arrives line by line. A \r ending the buffer may be the
+        # first half of a \r\n split across two reads, so it waits for the next read
+        if b"\r" in pending:
+            split = len(pending) - 1 if pending.endswith(b"\r") else len(pending)
+            pending[:split] = pending[:split].replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        view = memoryview(pending)
+        start = 0
+        end = pending.find(b"\n")
+        while end != -1:
+            self._emit_line(view[start:end + 1], buffer, output_type)
+            start = end + 1
+            end = pending.find(b"\n", start)
+        view.release()
+        del pending[:start]
+    
+    def _flush_pending(self, pending, buffer, output_type):
+        """Emit the final partial line once a pipe closes"""
+        if pending.endswith(b"\r"):
+            pending[-1:] = b"\n"
+        if pending:
+            self._emit_line(pending, buffer, output_type)
+    
+    def _emit_line(self, data, buffer, output_type):
+        """Store one line of output and notify listeners"""
+        buffer += data
+        excess = len(buffer) - self.OUTPUT_BUFFER_LIMIT
+        if excess > 0:
+            del buffer[:excess]
+        self._notify_output(str(data, "utf-8", "replace"), output_type)
+    
+    def _handle_exit(self, exit_code: int):
+        """Update status once the process has exited"""
         self.exit_code = exit_code
         self.end_time = time.time()
         
@@ -254,6 +397,7 @@ class Process:
         self._notify_output(exit_msg, OutputType.SYSTEM)
         
         logger.info(f"Process {self.process_id} exited with code {exit_code}")
+        self._exit_event.set()
         
         if self.on_exit:
             self.on_exit(exit_code)
@@ -272,8 +416,7 @@ class Process:
             return False
             
         try:
-            self.process.stdin.write(input_text + "\n")
-            self.process.stdin.flush()
+            self.process.stdin.write((input_text + "\n").encode())
             return True
         except:
             return False
@@ -296,19 +439,16 @@ class Process:
         
         try:
             # Send SIGTERM to the process group
-            os.killpg(os.getpgid(self.process.pid), signal.SIGTERM)
+            os.killpg(self._pgid, signal.SIGTERM)
             
-            # Wait for the process to exit
-            for _ in range(timeout):
-                if self.process.poll() is not None:
-                    break
-                time.sleep(1)
+            # Wait for the process to exit; the pump thread wakes this as soon as it does
+            self._exit_event.wait(timeout)
             
             # If still running, send SIGKILL
             if self.process.poll() is None:
                 self._notify_output("Process didn't respond to SIGTERM, sending SIGKILL...", OutputType.SYSTEM)
-                os.killpg(os.getpgid(self.process.pid), signal.SIGKILL)
-                self.process.wait(timeout=2)
+                os.killpg(self._pgid, signal.SIGKILL)
+                self._exit_event.wait(2)
             
             self._notify_output("Process stopped successfully", OutputType.SYSTEM)
             logger.info(f"Process {self.process_id} stopped")
@@ -319,6 +459,20 @@ class Process:
             logger.error(f"Error stopping process {self.process_id}: {str(e)}")
             return False
     
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the process has exited and its output has been collected.
+        
+        Args:
+            timeout: Seconds to wait (None = wait indefinitely)
+            
+        Returns:
+            True if the process exited, False if the timeout expired or it was never started
+        """
+        if not self.process:
+            return False
+        return self._exit_event.wait(timeout)
+    
     def is_running(self) -> bool:
         """Check if the process is currently running"""
         if not self.process:
@@ -335,11 +489,11 @@ class Process:
     
     def get_output(self) -> str:
         """Get the current output of the process"""
-        return "".join(self.output_buffer)
+        return self.output_buffer.decode("utf-8", "replace")
     
     def get_error(self) -> str:
         """Get the current error output of the process"""
-        return "".join(self.error_buffer)
+        return self.error_buffer.decode("utf-8", "replace")
     
     def get_combined_output(self) -> str:
         """Get combined stdout and stderr output"""
@@ -382,14 +536,157 @@ class Process:
         
         return f"Process {self.process_id} {status_str} {runtime_str}: {self.command}"
 
+class ShellSession:
+    """
+    A persistent bash process that runs foreground commands one after another, so each command
+    doesn't pay for starting a new shell. Every command runs in a subshell with stdin from
+    /dev/null, so cd/export/exit inside it don't leak into later commands.
+    """
+    def __init__(self, env: Optional[Dict[str, str]] = None):
+        """
+        Initialize a new ShellSession.
+        
+        Args:
+            env: Environment for the shell (None = inherit this process's environment)
+        """
+        self.env = env
+        self.process: Optional[subprocess.Popen] = None
+        # Sequence number for the completion markers, unique within this shell
+        self._seq = 0
+    
+    @staticmethod
+    def starts_background_job(command: str) -> bool:
+        """
+        Check whether a command leaves a job running after it returns ("cmd &", coproc). Such a job
+        would keep writing to the shell's output during later commands and share its process group,
+        so these commands should run as their own Process instead.
+        """
+        lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+        lexer.whitespace_split = True
+        try:
+            # "&&", ">&" and "&>" come out as their own tokens, so only a bare "&" matches
+            return any(token == "&" or token == "coproc" for token in lexer)
+        except ValueError:
+            # Unbalanced quotes; the shell reports the syntax error
+            return False
+    
+    def is_alive(self) -> bool:
+        """Check if the shell is running"""
+        return self.process is not None and self.process.poll() is None
+    
+    def start(self) -> None:
+        """Start the shell; stderr is merged into stdout so output stays in order"""
+        self.process = subprocess.Popen(
+            ["bash", "--noprofile", "--norc", "-s"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=self.env,
+            bufsize=0,
+            start_new_session=True  # Create a new process group
+        )
+        self._seq = 0
+    
+    def run(
+        self,
+        command: str,
+        working_dir: str,
+        timeout: Optional[float] = None,
+        on_line: Optional[Callable[[str], None]] = None,
+    ) -> Tuple[str, int]:
+        """
+        Run a command in the shell and wait for it to finish.
+        
+        Args:
+            command: The command to run
+            working_dir: Directory to run the command in
+            timeout: Seconds to wait before killing the shell (None = no timeout)
+            on_line: Called with each line of output as it arrives
+            
+        Returns:
+            Tuple of (output, exit_code); exit_code is -1 if the command timed out or the shell died
+        """
+        if not self.is_alive():
+            self.start()
+        
+        self._seq += 1
+        marker = f"__SHELL_SESSION_DONE_{os.getpid()}_{self._seq}__".encode()
+        # The command goes through eval as one quoted word, so a syntax error in it (e.g. an
+        # unbalanced quote) fails that command instead of swallowing the marker line below
+        script = (
+            f"( cd -- {shlex.quote(working_dir)} && eval {shlex.quote(command)} ) < /dev/null\n"
+            f"printf '%s %s\\n' {marker.decode()} \"$?\"\n"
+        )
+        self.process.stdin.write(script.encode())
+        
+        fd = self.process.stdout.fileno()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        output = bytearray()
+        # Offset of output not yet passed to on_line
+        emitted = 0
+        exit_code = -1
+        with selectors.DefaultSelector() as selector:
+            selector.register(fd, selectors.EVENT_READ)
+            while True:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and (remaining <= 0 or not selector.select(remaining)):
+                    logger.info(f"Shell command timed out after {timeout} seconds, killing the shell")
+                    self.close(force=True)
+                    break
+                
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    # The shell itself exited
+                    self.close(force=True)
+                    break
+                output += chunk
+                
+                end = output.find(marker, max(0, emitted - len(marker)))
+                if end != -1:
+                    newline = output.find(b"\n", end)
+                    if newline == -1:
+                        # Wait for the rest of the exit code
+                        continue
+                    exit_code = int(output[end + len(marker):newline])
+                    del output[end:]
+                    break
+                
+                if on_line:
+                    newline = output.rfind(b"\n")
+                    if newline >= emitted:
+                        for line in output[emitted:newline + 1].splitlines(keepends=True):
+                            on_line(str(line, "utf-8", "replace"))
+                        emitted = newline + 1
+        
+        if on_line and emitted < len(output):
+            for line in output[emitted:].splitlines(keepends=True):
+                on_line(str(line, "utf-8", "replace"))
+        
+        return output.decode("utf-8", "replace"), exit_code
+    
+    def close(self, force: bool = False) -> None:
+        """Stop the shell, killing its whole process group if force is set"""
+        if not self.process:
+            return
+        if self.process.poll() is None:
+            if force:
+                try:
+                    os.killpg(self.process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            else:
+                self.process.stdin.close()
+            try:
+                self.process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.process.pid, signal.SIGKILL)
+                self.process.wait()
+        self.process = None
+
 if __name__ == "__main__":
     # Example usage with output monitoring
     def on_output_handler(line: str, output_type: str, process_id: str):
-        prefix = {
-            OutputType.STDOUT: "[OUT]",
-            OutputType.STDERR: "[ERR]",
-            OutputType.SYSTEM: "[SYS]"
-        }.get(output_type, "[???]")
+        prefix = ("[OUT]", "[ERR]", "[SYS]")[output_type]
         print(f"{prefix} {line.rstrip()}")
 
     def on_exit_handler(exit_code: int):
@@ -407,8 +704,7 @@ if __name__ == "__main__":
     
     try:
         # Wait for user interrupt
-        while process.is_running():
-            time.sleep(0.1)
+        process.wait()
     except KeyboardInterrupt:
         print("Stopping process...")
         process.stop()
\ No newline at end of file
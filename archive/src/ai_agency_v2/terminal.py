@@ -6,21 +6,79 @@
 """
 
 import os
+import re
+import sys
 import uuid
-import signal
 import json
 import logging
 import datetime
-import atexit
+import threading
+import time
 import weakref
-from typing import Dict, List, Tuple, Optional, Any, Set, Callable
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from typing import Dict, List, Optional, Any, Set, Callable, Tuple
 
-from process import Process, ProcessStatus
+from process import Process, OutputType, ShellSession
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# "export NAME=..." or a bare "NAME=value" with no shell metacharacters
+_ENV_EXPORT_RE = re.compile(r'^\s*export\s+\w+=')
+_ENV_ASSIGN_RE = re.compile(r'^\s*\w+=[^ \t|&;<>()$`\\"\'*?\[\]#~%]*\s*$')
+
+# Quote characters stripped from environment variable values
+_QUOTES = ('"', "'")
+
+@dataclass(slots=True)
+class HistoryEntry:
+    """A command run in a terminal and its result"""
+    command: str
+    output: str
+    exit_code: int
+    directory: str
+    timestamp_ns: int  # time.time_ns(), only formatted when displayed or saved
+    process_id: Optional[str] = None
+    background: bool = False
+    
+    @property
+    def timestamp(self) -> str:
+        """Local time the command finished, in ISO format"""
+        seconds, nanoseconds = divmod(self.timestamp_ns, 1_000_000_000)
+        dt = datetime.datetime.fromtimestamp(seconds).replace(microsecond=nanoseconds // 1000)
+        return dt.isoformat()
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the entry to a dictionary for serialization"""
+        return {
+            "command": self.command,
+            "output": self.output,
+            "exit_code": self.exit_code,
+            "directory": self.directory,
+            "timestamp": self.timestamp,
+            "process_id": self.process_id,
+            "background": self.background
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'HistoryEntry':
+        """Create an entry from a dictionary produced by to_dict"""
+        dt = datetime.datetime.fromisoformat(data["timestamp"])
+        return cls(
+            command=data["command"],
+            output=data["output"],
+            exit_code=data["exit_code"],
+            # Entries loaded from disk would otherwise each hold their own copy of the same few directories
+            directory=sys.intern(data["directory"]),
+            timestamp_ns=int(dt.replace(microsecond=0).timestamp()) * 1_000_000_000 + dt.microsecond * 1000,
+            process_id=data.get("process_id"),
+            background=data.get("background", False)
+        )
+
+
 class Terminal:
     """
     A class representing a terminal session with command history and output.
@@ -33,35 +91,56 @@ class Terminal:
         timeout: int = 30,
         max_history: int = 100,
         env_vars: Dict[str, str] = None,
+        persistent_shell: bool = True,
     ):
         self.terminal_id = terminal_id if terminal_id else str(uuid.uuid4())
         self.base_dir = base_dir
         self.current_dir = base_dir
         self.timeout = timeout
         self.max_history = max_history
-        self.history: List[Dict[str, Any]] = []
+        # Oldest entries fall off the front once max_history is reached
+        self.history: deque = deque(maxlen=max_history)
+        # Total entries ever added to history, so savers can tell which entries are new
+        self.history_appended = 0
+        # Guards history and history_appended, which command threads update while savers read them
+        self._history_lock = threading.Lock()
         self.env_vars = env_vars or {}
+        # os.environ merged with env_vars, shared by this terminal's processes until env_vars change
+        self._process_env: Optional[Dict[str, str]] = None
         self.created_at = datetime.datetime.now().isoformat()
         
-        # Track all processes launched by this terminal
+        # Foreground commands run in one long-lived shell instead of a new process each
+        self.persistent_shell = persistent_shell
+        self._shell: Optional[ShellSession] = None
+        
+        # Track processes launched by this terminal. Processes move from processes to
+        # finished_processes when they exit, and only the last max_history finished ones are kept
         self.processes: Dict[str, Process] = {}
+        self.finished_processes: Dict[str, Process] = {}
         self.background_processes: Set[str] = set()
         
+        # Running process counts, kept up to date by the processes' exit callbacks
+        self._running_count = 0
+        self._bg_running_count = 0
+        self._process_lock = threading.Lock()
+        
         # Create the directory if it doesn't exist
         os.makedirs(self.base_dir, exist_ok=True)
         
         # Register cleanup on terminal object destruction
         self._finalizer = weakref.finalize(self, self._cleanup)
         
-        logger.info(f"Terminal {self.terminal_id} initialized in {self.base_dir}")
+        logger.info("Terminal %s initialized in %s", self.terminal_id, self.base_dir)
         
     def _cleanup(self):
         """Clean up resources when terminal is destroyed"""
-        logger.info(f"Terminal {self.terminal_id} cleaning up processes")
-        for process_id, process in list(self.processes.items()):
-            if process.is_running():
-                logger.info(f"Stopping process {process_id} during terminal cleanup")
-                process.stop()
+        logger.info("Terminal %s cleaning up processes", self.terminal_id)
+        with self._process_lock:
+            victims = [process for process in self.processes.values() if process.is_running()]
+        for process in victims:
+            logger.info("Stopping process %s during terminal cleanup", process.process_id)
+            process.stop()
+        self._close_shell()
                 
     def execute_command(
         self, 
@@ -69,7 +148,7 @@ class Terminal:
         timeout: int = None, 
         background: bool = False,
         output_callback: Optional[Callable[[str, str, str], None]] = None
-    ) -> Dict[str, Any]:
+    ) -> HistoryEntry:
         """
         Execute a command in the terminal and store the result in history.
         
@@ -81,9 +160,9 @@ class Terminal:
                             Function signature: fn(line, output_type, process_id)
             
         Returns:
-            A dictionary containing the command, output, and other info
+            A HistoryEntry containing the command, output, and other info
         """
-        logger.info(f"Terminal {self.terminal_id}: Executing command '{command}' (background={background})")
+        logger.info("Terminal %s: Executing command %r (background=%s)", self.terminal_id, command, background)
         
         # Handle cd commands specially to change the current directory
         if command.strip().startswith("cd "):
@@ -97,6 +176,9 @@ class Terminal:
         if command.strip().endswith(" &") and not background:
             command = command[:-2].strip()
             background = True
+        
+        if not background and self.persistent_shell and not ShellSession.starts_background_job(command):
+            return self._run_in_shell(command, timeout, output_callback)
             
         # Create a new process with output handling
         def on_output(line, output_type, proc_id):
@@ -110,7 +192,9 @@ class Terminal:
             working_dir=self.current_dir,
             env_vars=self.env_vars,
             background=background,
-            on_output=on_output
+            on_output=on_output,
+            on_exit=lambda exit_code: self._on_process_exit(process, background),
+            base_env=self._get_process_env()
         )
         
         # Store the process
@@ -118,23 +202,27 @@ class Terminal:
         if background:
             self.background_processes.add(process.process_id)
         
+        # Count it before starting, since a short-lived process can exit before start() returns
+        self._update_running_count(1, background)
+        
         # Start the process
         if not process.start():
+            self._on_process_exit(process, background)
             output = f"Error: Failed to start process for command '{command}'"
             exit_code = -1
             
             # Create result and add to history
-            result = {
-                "command": command,
-                "output": output,
-                "exit_code": exit_code,
-                "directory": self.current_dir,
-                "timestamp": datetime.datetime.now().isoformat(),
-                "process_id": process.process_id,
-                "background": background
-            }
-            
-            self.history.append(result)
+            result = HistoryEntry(
+                command=command,
+                output=output,
+                exit_code=exit_code,
+                directory=self.current_dir,
+                timestamp_ns=time.time_ns(),
+                process_id=process.process_id,
+                background=background
+            )
+            
+            self._add_history(result)
             return result
             
         # For foreground processes, wait for completion or timeout
@@ -142,46 +230,97 @@ class Terminal:
             if timeout is None:
                 timeout = self.timeout
                 
-            # Wait for the specified timeout
-            wait_time = 0
-            interval = 0.1  # Check every 0.1 seconds
-            
-            while process.is_running() and (timeout is None or wait_time < timeout):
-                wait_time += interval
-                import time
-                time.sleep(interval)
+            # Block until the process exits and its output is collected, or the timeout expires
+            finished = process.wait(timeout)
                 
             # If still running and we have a timeout, stop the process
-            if process.is_running() and timeout is not None:
-                logger.info(f"Command timed out after {timeout} seconds, sending stop signal")
+            if not finished and timeout is not None:
+                logger.info("Command timed out after %s seconds, sending stop signal", timeout)
                 process.stop()
                 
             output = process.get_combined_output()
-            exit_code = process.exit_code or -1
+            exit_code = process.exit_code if process.exit_code is not None else -1
         else:
             # For background processes, return immediately
             output = f"Process started in background with ID: {process.process_id}"
             exit_code = 0
         
         # Create result and add to history
-        result = {
-            "command": command,
-            "output": output,
-            "exit_code": exit_code,
-            "directory": self.current_dir,
-            "timestamp": datetime.datetime.now().isoformat(),
-            "process_id": process.process_id,
-            "background": background
-        }
+        result = HistoryEntry(
+            command=command,
+            output=output,
+            exit_code=exit_code,
+            directory=self.current_dir,
+            timestamp_ns=time.time_ns(),
+            process_id=process.process_id,
+            background=background
+        )
         
-        self.history.append(result)
+        self._add_history(result)
+            
+        return result
+    
+    def _run_in_shell(
+        self,
+        command: str,
+        timeout: Optional[int],
+        output_callback: Optional[Callable[[str, str, str], None]]
+    ) -> HistoryEntry:
+        """Run a foreground command in the terminal's persistent shell and store the result in history."""
+        if self._shell is None:
+            # Unbuffered so Python commands stream their output to the callback
+            self._shell = ShellSession(env={**self._get_process_env(), "PYTHONUNBUFFERED": "1"})
+        
+        if timeout is None:
+            timeout = self.timeout
+        
+        on_line = None
+        if output_callback:
+            # stderr is merged into stdout in the shell, and there is no separate process to report
+            on_line = lambda line: output_callback(line, OutputType.STDOUT, None)
+        
+        output, exit_code = self._shell.run(command, self.current_dir, timeout, on_line)
+        
+        result = HistoryEntry(
+            command=command,
+            output=output,
+            exit_code=exit_code,
+            directory=self.current_dir,
+            timestamp_ns=time.time_ns(),
+            process_id=None,
+            background=False
+        )
         
-        # Trim history if needed
-        if len(self.history) > self.max_history:
-            self.history = self.history[-self.max_history:]
+        self._add_history(result)
             
         return result
     
+    def _update_running_count(self, delta: int, background: bool) -> None:
+        """Adjust the running process counters"""
+        with self._process_lock:
+            self._running_count += delta
+            if background:
+                self._bg_running_count += delta
+    
+    def _on_process_exit(self, process: Process, background: bool) -> None:
+        """Exit callback for processes started by this terminal; retires the process to finished_processes"""
+        with self._process_lock:
+            self._running_count -= 1
+            if background:
+                self._bg_running_count -= 1
+            
+            self.processes.pop(process.process_id, None)
+            self.background_processes.discard(process.process_id)
+            self.finished_processes[process.process_id] = process
+            if len(self.finished_processes) > self.max_history:
+                del self.finished_processes[next(iter(self.finished_processes))]
+    
+    def _close_shell(self) -> None:
+        """Stop the persistent shell; it is restarted on the next foreground command"""
+        if self._shell is not None:
+            self._shell.close()
+            self._shell = None
+    
     def add_process_output_listener(self, process_id: str, listener: Callable[[str, str, str], None]) -> bool:
         """
         Add a listener for real-time output from a specific process.
@@ -217,26 +356,39 @@ class Terminal:
             
         return process.remove_output_listener(listener)
     
+    def _add_history(self, result: HistoryEntry) -> None:
+        """Add a command result to the history"""
+        with self._history_lock:
+            self.history.append(result)
+            self.history_appended += 1
+    
+    def history_snapshot(self) -> Tuple[int, Tuple[HistoryEntry, ...]]:
+        """Return history_appended and the history entries, read together in one consistent state"""
+        with self._history_lock:
+            return self.history_appended, tuple(self.history)
+    
+    def _get_process_env(self) -> Dict[str, str]:
+        """Get the environment for new processes, rebuilding it only after env_vars change"""
+        if self._process_env is None:
+            self._process_env = {**os.environ, **self.env_vars}
+        return self._process_env
+    
     def _is_env_var_command(self, command: str) -> bool:
         """Check if command is setting an environment variable"""
-        cmd = command.strip()
-        return (
-            cmd.startswith("export ") and "=" in cmd or
-            "=" in cmd and not any(c in cmd for c in " \t|&;<>()$`\\\"'*?[]#~=%")
-        )
+        return bool(_ENV_EXPORT_RE.match(command) or _ENV_ASSIGN_RE.match(command))
 
-    def _handle_env_var_command(self, command: str) -> Dict[str, Any]:
+    def _handle_env_var_command(self, command: str) -> HistoryEntry:
         """Handle setting environment variables"""
         cmd = command.strip()
         
         try:
             if cmd.startswith("export "):
                 # Handle export VAR=value
-                var_part = cmd[7:].strip()
-                if "=" in var_part:
-                    name, value = var_part.split("=", 1)
+                _, _, var_part = cmd.partition(" ")
+                name, sep, value = var_part.strip().partition("=")
+                if sep:
                     # Remove quotes if present
-                    if value and value[0] == value[-1] and value[0] in ('"', "'"):
+                    if value.startswith(_QUOTES) and value.endswith(value[0]):
                         value = value[1:-1]
                     self.env_vars[name.strip()] = value
                     output = f"Environment variable {name} set to {value}"
@@ -246,9 +398,9 @@ class Terminal:
                     exit_code = 1
             else:
                 # Handle VAR=value
-                name, value = cmd.split("=", 1)
+                name, _, value = cmd.partition("=")
                 # Remove quotes if present
-                if value and value[0] == value[-1] and value[0] in ('"', "'"):
+                if value.startswith(_QUOTES) and value.endswith(value[0]):
                     value = value[1:-1]
                 self.env_vars[name.strip()] = value
                 output = f"Environment variable {name} set to {value}"
@@ -257,35 +409,38 @@ class Terminal:
             output = f"Error setting environment variable: {str(e)}"
             exit_code = 1
         
+        # The environment changed, so new processes and the shell need to pick it up
+        self._process_env = None
+        self._close_shell()
+        
         # Create the result and add to history
-        result = {
-            "command": command,
-            "output": output,
-            "exit_code": exit_code,
-            "directory": self.current_dir,
-            "timestamp": datetime.datetime.now().isoformat(),
-            "process_id": None,
-            "background": False
-        }
+        result = HistoryEntry(
+            command=command,
+            output=output,
+            exit_code=exit_code,
+            directory=self.current_dir,
+            timestamp_ns=time.time_ns(),
+            process_id=None,
+            background=False
+        )
         
-        self.history.append(result)
+        self._add_history(result)
         return result
     
-    def _handle_cd_command(self, command: str) -> Dict[str, Any]:
+    def _handle_cd_command(self, command: str) -> HistoryEntry:
         """Handle cd commands to change the current directory."""
         # Extract the target directory
-        parts = command.strip().split(" ", 1)
-        if len(parts) < 2:
+        _, _, target_dir = command.strip().partition(" ")
+        target_dir = target_dir.strip()
+        if not target_dir:
             target_dir = os.path.expanduser("~")  # Default to home dir
-        else:
-            target_dir = parts[1].strip()
         
         # Handle relative paths
         if not os.path.isabs(target_dir):
             target_dir = os.path.join(self.current_dir, target_dir)
         
-        # Normalize the path
-        target_dir = os.path.normpath(target_dir)
+        # Normalize the path; interned since every history entry made in this directory refers to it
+        target_dir = sys.intern(os.path.normpath(target_dir))
         
         # Check if the directory exists
         if os.path.isdir(target_dir):
@@ -298,17 +453,17 @@ class Terminal:
             exit_code = 1
         
         # Create the result and add to history
-        result = {
-            "command": command,
-            "output": output,
-            "exit_code": exit_code,
-            "directory": self.current_dir,
-            "timestamp": datetime.datetime.now().isoformat(),
-            "process_id": None,
-            "background": False
-        }
+        result = HistoryEntry(
+            command=command,
+            output=output,
+            exit_code=exit_code,
+            directory=self.current_dir,
+            timestamp_ns=time.time_ns(),
+            process_id=None,
+            background=False
+        )
         
-        self.history.append(result)
+        self._add_history(result)
         return result
     
     def list_processes(self, all_processes: bool = False) -> List[Dict[str, Any]]:
@@ -321,15 +476,16 @@ class Terminal:
         Returns:
             List of process dictionaries
         """
-        result = []
-        for pid, process in self.processes.items():
-            if all_processes or process.is_running():
-                result.append(process.to_dict())
-        return result
+        with self._process_lock:
+            processes = list(self.processes.values())
+            if all_processes:
+                processes.extend(self.finished_processes.values())
+        
+        return [process.to_dict() for process in processes if all_processes or process.is_running()]
     
     def get_process(self, process_id: str) -> Optional[Process]:
         """Get a process by its ID"""
-        return self.processes.get(process_id)
+        return self.processes.get(process_id) or self.finished_processes.get(process_id)
     
     def kill_process(self, process_id: str) -> bool:
         """
@@ -348,8 +504,8 @@ class Terminal:
         if process.is_running():
             process.stop()
             
-        if process_id in self.background_processes:
-            self.background_processes.remove(process_id)
+        with self._process_lock:
+            self.background_processes.discard(process_id)
             
         return True
     
@@ -363,14 +519,16 @@ class Terminal:
         Returns:
             Number of processes killed
         """
-        count = 0
-        for pid, process in list(self.processes.items()):
-            if process.is_running():
-                if include_background or pid not in self.background_processes:
-                    process.stop()
-                    count += 1
+        # Exited processes remove themselves from self.processes, so only stop them here
+        with self._process_lock:
+            victims = [
+                process for process in self.processes.values()
+                if process.is_running() and (include_background or process.process_id not in self.background_processes)
+            ]
+        for process in victims:
+            process.stop()
                     
-        return count
+        return len(victims)
     
     def get_process_output(self, process_id: str) -> Optional[str]:
         """
@@ -412,21 +570,17 @@ class Terminal:
         Returns:
             A dictionary containing terminal information
         """
-        running_processes = sum(1 for p in self.processes.values() if p.is_running())
-        background_processes = sum(1 for pid in self.background_processes 
-                                  if pid in self.processes and self.processes[pid].is_running())
-        
         return {
             "terminal_id": self.terminal_id,
             "current_dir": self.current_dir,
             "base_dir": self.base_dir,
             "history_length": len(self.history),
             "created_at": self.created_at,
-            "running_processes": running_processes,
-            "background_processes": background_processes
+            "running_processes": self._running_count,
+            "background_processes": self._bg_running_count
         }
     
-    def get_history(self, limit: int = None) -> List[Dict[str, Any]]:
+    def get_history(self, limit: int = None) -> List[HistoryEntry]:
         """
         Get the command history.
         
@@ -436,30 +590,42 @@ class Terminal:
         Returns:
             List of command history items
         """
-        if limit is None or limit > len(self.history):
-            return self.history
-        return self.history[-limit:]
+        with self._history_lock:
+            if limit is None or limit > len(self.history):
+                return list(self.history)
+            return list(islice(self.history, len(self.history) - limit, None))
     
-    def to_dict(self) -> Dict[str, Any]:
+    def to_dict(self, include_history: bool = True) -> Dict[str, Any]:
         """
         Convert the terminal to a dictionary for serialization.
         
+        Args:
+            include_history: Whether to include the command history
+            
         Returns:
             Dictionary representation of the terminal
         """
+        # Background processes remove themselves from the set as they exit
+        with self._process_lock:
+            background_process_ids = list(self.background_processes)
+        
         # We exclude processes from serialization, because they can't be properly serialized/restored
-        return {
+        data = {
             "terminal_id": self.terminal_id,
             "base_dir": self.base_dir,
             "current_dir": self.current_dir,
             "timeout": self.timeout,
             "max_history": self.max_history,
             "env_vars": self.env_vars,
-            "history": self.history,
+            "persistent_shell": self.persistent_shell,
             "created_at": self.created_at,
             # We only save the list of running background processes, not the actual process objects
-            "background_process_ids": list(self.background_processes)
+            "background_process_ids": background_process_ids
         }
+        if include_history:
+            _, history = self.history_snapshot()
+            data["history"] = [entry.to_dict() for entry in history]
+        return data
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Terminal':
@@ -477,10 +643,15 @@ class Terminal:
             base_dir=data["base_dir"],
             timeout=data["timeout"],
             max_history=data["max_history"],
-            env_vars=data.get("env_vars", {})
+            env_vars=data.get("env_vars", {}),
+            persistent_shell=data.get("persistent_shell", True)
+        )
+        terminal.current_dir = sys.intern(data["current_dir"])
+        terminal.history = deque(
+            (HistoryEntry.from_dict(entry) for entry in data.get("history", [])),
+            maxlen=terminal.max_history
         )
-        terminal.current_dir = data["current_dir"]
-        terminal.history = data["history"]
+        terminal.history_appended = len(terminal.history)
         terminal.created_at = data["created_at"]
         
         # Restore background process IDs (but not the actual processes)
@@ -570,7 +741,7 @@ class TerminalManager:
         """
         return self.terminals.get(terminal_id)
     
-    def run_command(self, terminal_id: str, command: str) -> Dict[str, Any]:
+    def run_command(self, terminal_id: str, command: str) -> HistoryEntry:
         """
         Run a command on a specific terminal.
         
@@ -724,22 +895,23 @@ class TerminalManager:
         status = terminal.get_status()
         history = terminal.get_history()
         
-        terminal_str = ""
-        terminal_str += f"Terminal ID: {status['terminal_id']}\n"
-        terminal_str += f"Current Directory: {status['current_dir']}\n"
-        terminal_str += f"Base Directory: {status['base_dir']}\n"
-        terminal_str += f"History Length: {status['history_length']}\n"
-        terminal_str += f"Created At: {status['created_at']}\n"
-        terminal_str += "\n"
+        parts = [
+            f"Terminal ID: {status['terminal_id']}\n",
+            f"Current Directory: {status['current_dir']}\n",
+            f"Base Directory: {status['base_dir']}\n",
+            f"History Length: {status['history_length']}\n",
+            f"Created At: {status['created_at']}\n",
+            "\n",
+        ]
         
         if history:
-            terminal_str += "Command History:\n"
+            parts.append("Command History:\n")
             for entry in history:
-                terminal_str += f"  Command: {entry['directory']}: {entry['command']}\n"
-                terminal_str += f"  Output: {entry['output']}\n"
-                terminal_str += "\n"
+                parts.append(f"  Command: {entry.directory}: {entry.command}\n")
+                parts.append(f"  Output: {entry.output}\n")
+                parts.append("\n")
                 
-        return terminal_str
+        return "".join(parts)
 
 
 # Example usage
@@ -755,12 +927,12 @@ if __name__ == "__main__":
     
     # Run some commands
     result = manager.run_command(terminal.terminal_id, "pwd")
-    print(f"Command: {result['command']}")
-    print(f"Output: {result['output']}")
+    print(f"Command: {result.command}")
+    print(f"Output: {result.output}")
     
     result = manager.run_command(terminal.terminal_id, "echo $CUSTOM_VAR")
-    print(f"Command: {result['command']}")
-    print(f"Output: {result['output']}")
+    print(f"Command: {result.command}")
+    print(f"Output: {result.output}")
     
     # List all terminals
     terminals = manager.list_terminals()
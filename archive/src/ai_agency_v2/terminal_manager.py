@@ -2,19 +2,47 @@
 Terminal Manager for managing multiple terminals with proper process handling
 """
 import os
-import json
 import logging
 import atexit
 import signal
+import threading
 import time
-from typing import Dict, List, Optional, Any, Set, Callable, Tuple
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Any, Set, Callable, Tuple
 
-from terminal import Terminal
+import orjson
+
+from terminal import Terminal, HistoryEntry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def _write_file(path: str, data: bytes, flags: int = os.O_TRUNC) -> None:
+    """Write bytes straight to a file descriptor, without Python's buffered IO layer"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | flags, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
+def _replace_file(path: str, data: bytes) -> None:
+    """Write to a temporary file and swap it in, so a crash mid-write can't leave a truncated save"""
+    tmp_path = f"{path}.tmp"
+    _write_file(tmp_path, data)
+    os.replace(tmp_path, path)
+
+
+def _encode_history(entries: Iterable[HistoryEntry]) -> bytes:
+    """Encode history entries as JSON Lines"""
+    return b"".join(orjson.dumps(entry.to_dict()) + b"\n" for entry in entries)
+
+
 class TerminalManager:
     """
     Manages multiple terminal instances with options to save and load sessions.
@@ -37,6 +65,8 @@ class TerminalManager:
         default_env_vars: Dict[str, str] = None,
         auto_save: bool = True,
         auto_save_interval: int = 60,  # seconds
+        flush_interval: float = 0.5,  # seconds
+        max_workers: Optional[int] = None,
     ):
         if TerminalManager._instance is not None:
             logger.warning("TerminalManager instance already exists, use get_instance() instead")
@@ -57,6 +87,31 @@ class TerminalManager:
         self.auto_save_interval = auto_save_interval
         self._last_save_time = 0
         
+        # Terminals changed since they were last written; flushed together by the auto-save thread
+        # so a burst of commands costs one write per terminal instead of one per command
+        self.flush_interval = flush_interval
+        self._dirty: Set[str] = set()
+        self._dirty_lock = threading.Lock()
+        
+        # Each terminal is saved as a small <id>.meta.json plus an append-only <id>.history.jsonl;
+        # these track how much of each history log is already on disk
+        self._save_lock = threading.Lock()
+        self._persisted_history: Dict[str, int] = {}
+        self._history_log_lines: Dict[str, int] = {}
+        
+        # IDs of every terminal saved on disk, recorded in index.json; saved terminals are only
+        # loaded when first requested
+        self._index_path = os.path.join(self.save_dir, "index.json")
+        self._known_ids: Set[str] = set()
+        # Serializes loads so concurrent first requests for a terminal build only one Terminal
+        self._load_lock = threading.Lock()
+        
+        # Commands submitted with run_command_async run on this pool. Commands on the same terminal
+        # are serialized by a per-terminal lock, since a terminal runs one foreground command at a time
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count(), thread_name_prefix="terminal")
+        self._command_locks: Dict[str, threading.Lock] = {}
+        self._command_locks_lock = threading.Lock()
+        
         # Create the save directory if it doesn't exist
         os.makedirs(self.save_dir, exist_ok=True)
         
@@ -68,8 +123,8 @@ class TerminalManager:
         
         logger.info(f"Terminal manager initialized with save directory: {self.save_dir}")
         
-        # Try to load existing terminals
-        self.load_all_terminals()
+        # Find existing terminals (they are loaded on first use)
+        self._discover_ids()
         
         # Start auto-save if enabled
         if self.auto_save:
@@ -91,9 +146,14 @@ class TerminalManager:
         """Clean up resources on shutdown"""
         logger.info("Terminal manager cleaning up resources")
         
+        # Drop queued async commands; running ones finish or are stopped with their processes below
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        
         # Save all terminals
         if self.auto_save:
             self.save_all_terminals()
+            with self._dirty_lock:
+                self._dirty.clear()
             
         # Kill all running processes
         for terminal_id, terminal in list(self.terminals.items()):
@@ -102,11 +162,10 @@ class TerminalManager:
     
     def _start_auto_save(self):
         """Start a background thread for auto-saving"""
-        import threading
-        
         def auto_save_worker():
             while True:
-                time.sleep(self.auto_save_interval)
+                time.sleep(self.flush_interval)
+                self.flush_dirty_terminals()
                 
                 # Check if we need to save
                 current_time = time.time()
@@ -142,7 +201,7 @@ class TerminalManager:
             The created Terminal instance
         """
         # Apply default settings if not provided
-        if terminal_id and terminal_id in self.terminals:
+        if terminal_id and (terminal_id in self.terminals or terminal_id in self._known_ids):
             raise ValueError(f"Terminal with ID {terminal_id} already exists")
         
         terminal = Terminal(
@@ -162,9 +221,26 @@ class TerminalManager:
         
         return terminal
     
+    def mark_dirty(self, terminal_id: str) -> None:
+        """Queue a terminal to be saved by the next flush"""
+        with self._dirty_lock:
+            self._dirty.add(terminal_id)
+    
+    def flush_dirty_terminals(self) -> int:
+        """
+        Save every terminal that changed since the last flush.
+        
+        Returns:
+            Number of terminals saved
+        """
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        
+        return sum(1 for terminal_id in dirty if self.save_terminal(terminal_id))
+    
     def get_terminal(self, terminal_id: str) -> Optional[Terminal]:
         """
-        Get a terminal by its ID.
+        Get a terminal by its ID, loading it from disk if it was saved but not yet loaded.
         
         Args:
             terminal_id: ID of the terminal to retrieve
@@ -172,7 +248,14 @@ class TerminalManager:
         Returns:
             Terminal instance if found, None otherwise
         """
-        return self.terminals.get(terminal_id)
+        terminal = self.terminals.get(terminal_id)
+        if terminal is None and terminal_id in self._known_ids:
+            with self._load_lock:
+                # Another thread may have loaded it while this one waited for the lock
+                terminal = self.terminals.get(terminal_id)
+                if terminal is None:
+                    terminal = self.load_terminal(terminal_id)
+        return terminal
     
     def run_command(
         self, 
@@ -181,7 +264,7 @@ class TerminalManager:
         timeout: int = None,
         background: bool = False,
         output_callback: Optional[Callable[[str, str, str], None]] = None
-    ) -> Dict[str, Any]:
+    ) -> HistoryEntry:
         """
         Run a command on a specific terminal.
         
@@ -203,19 +286,53 @@ class TerminalManager:
         if not terminal:
             raise ValueError(f"Terminal with ID {terminal_id} not found")
         
-        result = terminal.execute_command(
-            command, 
-            timeout=timeout, 
-            background=background,
-            output_callback=output_callback
-        )
+        with self._command_lock(terminal_id):
+            result = terminal.execute_command(
+                command, 
+                timeout=timeout, 
+                background=background,
+                output_callback=output_callback
+            )
         
         # Save terminal state after command execution if needed
         if self.auto_save:
-            self.save_terminal(terminal.terminal_id)
+            self.mark_dirty(terminal.terminal_id)
         
         return result
     
+    def run_command_async(
+        self, 
+        terminal_id: str, 
+        command: str, 
+        timeout: int = None,
+        background: bool = False,
+        output_callback: Optional[Callable[[str, str, str], None]] = None
+    ) -> "Future[HistoryEntry]":
+        """
+        Run a command on a specific terminal without blocking the caller.
+        
+        Commands on different terminals run in parallel on the manager's thread pool;
+        commands on the same terminal run one after another.
+        
+        Args:
+            terminal_id: ID of the terminal to run the command on
+            command: The command to execute
+            timeout: Command timeout (None uses terminal's default)
+            background: Whether to run as a background process
+            output_callback: Optional callback for real-time process output
+                            Function signature: fn(line, output_type, process_id)
+            
+        Returns:
+            A Future resolving to the result of the command execution, or raising ValueError
+            if terminal_id doesn't exist
+        """
+        return self._pool.submit(self.run_command, terminal_id, command, timeout, background, output_callback)
+    
+    def _command_lock(self, terminal_id: str) -> threading.Lock:
+        """Get the lock that serializes commands on a terminal"""
+        with self._command_locks_lock:
+            return self._command_locks.setdefault(terminal_id, threading.Lock())
+    
     def delete_terminal(self, terminal_id: str, kill_processes: bool = True) -> bool:
         """
         Delete a terminal instance.
@@ -237,11 +354,19 @@ class TerminalManager:
             
         # Remove from dict of terminals
         del self.terminals[terminal_id]
+        with self._command_locks_lock:
+            self._command_locks.pop(terminal_id, None)
             
-        # Remove saved file if exists
-        save_path = os.path.join(self.save_dir, f"{terminal_id}.json")
-        if os.path.exists(save_path):
-            os.remove(save_path)
+        # Remove saved files if they exist
+        with self._save_lock:
+            for save_path in (*self._save_paths(terminal_id), self._legacy_save_path(terminal_id)):
+                if os.path.exists(save_path):
+                    os.remove(save_path)
+            self._persisted_history.pop(terminal_id, None)
+            self._history_log_lines.pop(terminal_id, None)
+            if terminal_id in self._known_ids:
+                self._known_ids.discard(terminal_id)
+                self._write_index()
                 
         logger.info(f"Deleted terminal with ID: {terminal_id}")
         return True
@@ -253,12 +378,27 @@ class TerminalManager:
         Returns:
             List of terminal status dictionaries
         """
+        self.load_all_terminals()
         return [terminal.get_status() for terminal in self.terminals.values()]
     
+    def _save_paths(self, terminal_id: str) -> Tuple[str, str]:
+        """Get the (metadata, history log) save paths for a terminal"""
+        return (
+            os.path.join(self.save_dir, f"{terminal_id}.meta.json"),
+            os.path.join(self.save_dir, f"{terminal_id}.history.jsonl"),
+        )
+    
+    def _legacy_save_path(self, terminal_id: str) -> str:
+        """Single-file save path used before history was split into its own log"""
+        return os.path.join(self.save_dir, f"{terminal_id}.json")
+    
     def save_terminal(self, terminal_id: str) -> bool:
         """
         Save a terminal's state to disk.
         
+        Only history entries added since the last save are appended to the history log; the log
+        is rewritten from the in-memory history once it grows past twice max_history.
+        
         Args:
             terminal_id: ID of the terminal to save
             
@@ -269,11 +409,35 @@ class TerminalManager:
         if not terminal:
             return False
         
-        save_path = os.path.join(self.save_dir, f"{terminal_id}.json")
+        meta_path, log_path = self._save_paths(terminal_id)
         try:
-            with open(save_path, 'w') as f:
-                json.dump(terminal.to_dict(), f, indent=2)
-            logger.debug(f"Saved terminal {terminal_id} to {save_path}")
+            with self._save_lock:
+                # Taken together so a command finishing mid-save can't shift the new entries
+                appended, history = terminal.history_snapshot()
+                new_count = min(appended - self._persisted_history.get(terminal_id, 0), len(history))
+                log_lines = self._history_log_lines.get(terminal_id)
+                
+                if log_lines is None or log_lines + new_count > 2 * terminal.max_history:
+                    # Compact (or create) the log from the current history
+                    _replace_file(log_path, _encode_history(history))
+                    log_lines = len(history)
+                elif new_count:
+                    new_entries = history[len(history) - new_count:]
+                    _write_file(log_path, _encode_history(new_entries), os.O_APPEND)
+                    log_lines += new_count
+                self._history_log_lines[terminal_id] = log_lines
+                self._persisted_history[terminal_id] = appended
+                
+                _replace_file(meta_path, orjson.dumps(terminal.to_dict(include_history=False)))
+                
+                legacy_path = self._legacy_save_path(terminal_id)
+                if os.path.exists(legacy_path):
+                    os.remove(legacy_path)
+                
+                if terminal_id not in self._known_ids:
+                    self._known_ids.add(terminal_id)
+                    self._write_index()
+            logger.debug(f"Saved terminal {terminal_id} to {meta_path}")
             self._last_save_time = time.time()
             return True
         except Exception as e:
@@ -290,36 +454,81 @@ class TerminalManager:
         Returns:
             Loaded Terminal instance if successful, None otherwise
         """
-        save_path = os.path.join(self.save_dir, f"{terminal_id}.json")
+        meta_path, log_path = self._save_paths(terminal_id)
+        legacy_path = self._legacy_save_path(terminal_id)
         try:
-            if os.path.exists(save_path):
-                with open(save_path, 'r') as f:
-                    data = json.load(f)
+            if os.path.exists(meta_path):
+                with open(meta_path, 'rb') as f:
+                    data = orjson.loads(f.read())
+                
+                # Stream the log, keeping only the newest max_history entries
+                history = deque(maxlen=data["max_history"])
+                log_lines = 0
+                if os.path.exists(log_path):
+                    with open(log_path, 'rb') as f:
+                        for line in f:
+                            if line.strip():
+                                history.append(orjson.loads(line))
+                                log_lines += 1
+                data["history"] = list(history)
+                
+                terminal = Terminal.from_dict(data)
+                self._history_log_lines[terminal_id] = log_lines
+                self._persisted_history[terminal_id] = terminal.history_appended
+                save_path = meta_path
+            elif os.path.exists(legacy_path):
+                with open(legacy_path, 'rb') as f:
+                    data = orjson.loads(f.read())
                 terminal = Terminal.from_dict(data)
-                self.terminals[terminal.terminal_id] = terminal
-                logger.info(f"Loaded terminal {terminal_id} from {save_path}")
-                return terminal
+                save_path = legacy_path
+            else:
+                return None
+            
+            self.terminals[terminal.terminal_id] = terminal
+            logger.info(f"Loaded terminal {terminal_id} from {save_path}")
+            return terminal
         except Exception as e:
             logger.error(f"Error loading terminal {terminal_id}: {str(e)}")
         
         return None
     
+    def _discover_ids(self) -> None:
+        """Read the IDs of saved terminals from the index, building the index if there isn't one"""
+        if os.path.exists(self._index_path):
+            try:
+                with open(self._index_path, 'rb') as f:
+                    self._known_ids = set(orjson.loads(f.read()))
+                return
+            except Exception as e:
+                logger.error(f"Error reading terminal index, rebuilding it: {str(e)}")
+        
+        # No usable index yet (e.g. saves from before it existed), so scan the save file names once
+        for filename in os.listdir(self.save_dir):
+            if filename.endswith(".meta.json"):
+                self._known_ids.add(filename[:-len(".meta.json")])
+            elif filename.endswith(".json") and filename != "index.json":
+                self._known_ids.add(filename[:-len(".json")])
+        self._write_index()
+    
+    def _write_index(self) -> None:
+        """Write the IDs of saved terminals to the index"""
+        _replace_file(self._index_path, orjson.dumps(sorted(self._known_ids)))
+    
     def load_all_terminals(self) -> int:
         """
-        Load all saved terminals from the save directory.
+        Load all saved terminals that haven't been loaded yet.
         
         Returns:
             Number of terminals loaded
         """
         count = 0
-        if os.path.exists(self.save_dir):
-            for filename in os.listdir(self.save_dir):
-                if filename.endswith(".json"):
-                    terminal_id = filename.replace(".json", "")
-                    if self.load_terminal(terminal_id):
-                        count += 1
-        
-        logger.info(f"Loaded {count} terminals from {self.save_dir}")
+        with self._load_lock:
+            for terminal_id in self._known_ids - self.terminals.keys():
+                if self.load_terminal(terminal_id):
+                    count += 1
+        
+        if count:
+            logger.info(f"Loaded {count} terminals from {self.save_dir}")
         return count
     
     def save_all_terminals(self) -> int:
@@ -492,13 +701,13 @@ class TerminalManager:
             output.append("Recent Command History:")
             # Show most recent commands first, limited to 10
             for entry in reversed(history[-10:]):
-                cmd = entry['command']
-                dir_path = entry['directory']
-                timestamp = entry['timestamp'].split('T')[-1].split('.')[0]  # Just time part
+                cmd = entry.command
+                dir_path = entry.directory
+                timestamp = entry.timestamp.split('T')[-1].split('.')[0]  # Just time part
                 output.append(f"  [{timestamp}] {dir_path}$ {cmd}")
                 
                 # Truncate output if too long
-                out = entry['output']
+                out = entry.output
                 if len(out) > 500:
                     out = out[:500] + "... [output truncated]"
                 if out:
@@ -526,30 +735,30 @@ if __name__ == "__main__":
     
     # Run some commands
     result = manager.run_command(terminal.terminal_id, "pwd")
-    print(f"Command: {result['command']}")
-    print(f"Output: {result['output']}")
+    print(f"Command: {result.command}")
+    print(f"Output: {result.output}")
     
     result = manager.run_command(terminal.terminal_id, "echo $CUSTOM_VAR")
-    print(f"Command: {result['command']}")
-    print(f"Output: {result['output']}")
+    print(f"Command: {result.command}")
+    print(f"Output: {result.output}")
     
     # Example 2: Long-running background process
     print("\n=== Example 2: Long-running Background Process ===")
     
     # Run a background process (simple HTTP server)
     result = manager.run_command(terminal.terminal_id, "python -m http.server 8888", background=True)
-    print(f"Started background process: {result['process_id']}")
+    print(f"Started background process: {result.process_id}")
     
     # Wait a bit for the server to start
     time.sleep(2)
     
     # Check if it's running
     terminal_obj = manager.get_terminal(terminal.terminal_id)
-    process = terminal_obj.get_process(result['process_id'])
+    process = terminal_obj.get_process(result.process_id)
     print(f"Process is running: {process.is_running()}")
     
     # Get process output
-    output = terminal_obj.get_process_output(result['process_id'])
+    output = terminal_obj.get_process_output(result.process_id)
     print(f"Process output: {output}")
     
     # Example 3: Managing multiple terminals
@@ -560,7 +769,7 @@ if __name__ == "__main__":
     
     # Run a command in the second terminal
     result = manager.run_command(terminal2.terminal_id, "echo 'Hello from terminal 2'")
-    print(f"Output from terminal 2: {result['output']}")
+    print(f"Output from terminal 2: {result.output}")
     
     # List all terminals
     terminals = manager.list_terminals()
@@ -146,18 +146,18 @@ class RunCommandTool(BaseTool):
 
             if background:
                 return (
-                    f"Command started in background with process ID: {result['process_id']}\n"
+                    f"Command started in background with process ID: {result.process_id}\n"
                     f"You can check on it later using list_processes or get_process_output."
                 )
             else:
-                output_str = result["output"]
+                output_str = result.output
                 # If output is very long, truncate it
                 if len(output_str) > 4000:
                     output_str = output_str[:4000] + "\n[Output truncated due to length...]"
                 
                 return (
                     f"Command: {command}\n"
-                    f"Exit code: {result['exit_code']}\n"
+                    f"Exit code: {result.exit_code}\n"
                     f"Output:\n{output_str}"
                 )
                 
@@ -260,15 +260,15 @@ class GetTerminalHistoryTool(BaseTool):
                 
             result = [f"Command history for terminal {terminal_id}:"]
             for idx, entry in enumerate(history):
-                cmd_output = entry["output"]
+                cmd_output = entry.output
                 # Truncate long outputs
                 if len(cmd_output) > 500:
                     cmd_output = cmd_output[:500] + "\n[Output truncated...]"
                 
                 result.append(
-                    f"{idx+1}. Command: {entry['command']}\n"
-                    f"   Directory: {entry['directory']}\n"
-                    f"   Exit code: {entry.get('exit_code', 'N/A')}\n"
+                    f"{idx+1}. Command: {entry.command}\n"
+                    f"   Directory: {entry.directory}\n"
+                    f"   Exit code: {entry.exit_code}\n"
                     f"   Output:\n{cmd_output}\n"
                 )
                 
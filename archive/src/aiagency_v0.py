@@ -3,17 +3,84 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from pydantic import BaseModel, Field
+import asyncio
+import hashlib
+import operator
+from typing import Annotated, TypedDict
+import numpy as np
+from pydantic import BaseModel, Field, PrivateAttr
 
 from langchain_openai import ChatOpenAI
+from langchain_core.load import dumps
+from langchain_core.messages import HumanMessage, SystemMessage
 
-from langgraph_supervisor import create_supervisor
+from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
 from langgraph.prebuilt import create_react_agent
 
 from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.store.memory import InMemoryStore
 
-model = ChatOpenAI(model="gpt-4o-mini")
+class SemanticCacheChatOpenAI(ChatOpenAI):
+    """
+    ChatOpenAI that reuses responses to repeated prompts instead of calling the API again.
+    An exact repeat of (model, messages, stop, tools) returns the cached response. Failing that, if
+    the earlier messages match a cached call exactly and the final user message is close in meaning
+    (cosine similarity above similarity_threshold), that call's response is reused.
+    Only temperature=0 calls are cached.
+    """
+    similarity_threshold: float = 0.95
+    _exact: dict = PrivateAttr(default_factory=dict)
+    # hash of everything but the final user message -> ([embeddings], [results])
+    _similar: dict = PrivateAttr(default_factory=dict)
+
+    def _cache_lookup(self, messages, stop, kwargs):
+        """Find a cached result for this call; also returns the keys a new result is stored under"""
+        context = hashlib.sha256(dumps([self.model_name, messages[:-1], stop, kwargs]).encode()).digest()
+        exact_key = hashlib.sha256(context + dumps(messages[-1]).encode()).digest()
+        if exact_key in self._exact:
+            return self._exact[exact_key], None
+
+        query = None
+        if isinstance(messages[-1], HumanMessage):
+            from rag import embeddings
+            query = np.asarray(embeddings.embed_query(str(messages[-1].content)), dtype=np.float32)
+            if context in self._similar:
+                vectors, results = self._similar[context]
+                scores = np.stack(vectors) @ query
+                best = int(np.argmax(scores))
+                if scores[best] > self.similarity_threshold:
+                    return results[best], None
+        return None, (exact_key, context, query)
+
+    def _cache_store(self, keys, result):
+        exact_key, context, query = keys
+        self._exact[exact_key] = result
+        if query is not None:
+            vectors, results = self._similar.setdefault(context, ([], []))
+            vectors.append(query)
+            results.append(result)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.temperature != 0:
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        result, keys = self._cache_lookup(messages, stop, kwargs)
+        if result is None:
+            result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            self._cache_store(keys, result)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.temperature != 0:
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        # Embedding the query runs the model synchronously, so keep it off the event loop
+        result, keys = await asyncio.to_thread(self._cache_lookup, messages, stop, kwargs)
+        if result is None:
+            result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            self._cache_store(keys, result)
+        return result
+
+model = SemanticCacheChatOpenAI(model="gpt-4o-mini", temperature=0)
 
 
 # Tools
@@ -27,25 +94,29 @@ import os
 #     Repo.init(repo_path)
 #     return None
 
-def make_dir(directory_path: str) -> None:
+async def make_dir(directory_path: str) -> None:
     """
     Create a new directory under agent_workspace for example:
         "example_project" makes a new directory "agent_workspace/example_project"
         "example_project/backend" makes a new directory "agent_workspace/example_project/backend"
     """
     print(f"Creating directory {directory_path}")
-    os.makedirs(f'agent_workspace/{directory_path}', exist_ok=True)
+    await asyncio.to_thread(os.makedirs, f'agent_workspace/{directory_path}', exist_ok=True)
     return None
 
-def make_file(file_path: str, content: str) -> None:
+def _write_file(path: str, content: str) -> None:
+    with open(path, "w") as f:
+        f.write(content)
+
+async def make_file(file_path: str, content: str) -> None:
     """
     Create a new file under agent_workspace for example:
         "example_project/backend/app.py" makes a new file "agent_workspace/example_project/backend/app.py"
         "example_project/frontend/index.html" makes a new file "agent_workspace/example_project/frontend/index.html"
     """
     print(f"Creating file {file_path}")
-    with open(f'agent_workspace/{file_path}', "w") as f:
-        f.write(content)
+    # Disk writes run in a worker thread so they don't stall the other agent's LLM calls
+    await asyncio.to_thread(_write_file, f'agent_workspace/{file_path}', content)
     return None
 
 backend_swe_agent = create_react_agent(
@@ -88,17 +159,65 @@ frontend_swe_agent = create_react_agent(
 #     )
 # )
 
-workflow = create_supervisor(
-    [backend_swe_agent, frontend_swe_agent],
-    tools=[make_dir, make_file],
-    model=model,
-    prompt=(
-        "You are a team supervisor managing two software engineers. "
-        "You first make a new directory for the project by using make_dir."
-        "Determine the interface between backend and frontend and assign tasks to each of them. Provide with the tasks they need and the name of the project_directory."
-        "They will then report back to you and you will return a summary of the entire project and instructions on how to run it."
-    )
-)
+# The backend and frontend work doesn't depend on each other once the interface is fixed, so
+# instead of a supervisor handing off to one engineer at a time, a planner fixes the interface,
+# both engineers run in parallel, and their reports are combined at the end.
+class ProjectPlan(BaseModel):
+    project_directory: str = Field(description="Name of the new project directory")
+    interface: str = Field(description="The API contract between the backend and the frontend")
+    backend_task: str = Field(description="Task for the backend engineer")
+    frontend_task: str = Field(description="Task for the frontend engineer")
+
+class ProjectState(TypedDict, total=False):
+    messages: list
+    plan: ProjectPlan
+    reports: Annotated[list[str], operator.add]
+    summary: str
+
+async def plan_project(state: ProjectState) -> ProjectState:
+    plan = await model.with_structured_output(ProjectPlan).ainvoke([
+        SystemMessage(
+            "You are a team supervisor managing a backend and a frontend software engineer. "
+            "Name a new directory for the project, determine the interface between backend and frontend, "
+            "and write the task each engineer needs to do."
+        ),
+        *state["messages"],
+    ])
+    await make_dir(plan.project_directory)
+    return {"plan": plan}
+
+def assign_tasks(state: ProjectState) -> list[Send]:
+    plan = state["plan"]
+    return [
+        Send(engineer, {"task": f"Project directory: {plan.project_directory}\nInterface:\n{plan.interface}\nYour task:\n{task}"})
+        for engineer, task in (("backend_swe", plan.backend_task), ("frontend_swe", plan.frontend_task))
+    ]
+
+def run_engineer(agent):
+    async def node(assignment: dict) -> ProjectState:
+        result = await agent.ainvoke({"messages": [HumanMessage(assignment["task"])]})
+        return {"reports": [f"{agent.name}: {result['messages'][-1].content}"]}
+    return node
+
+async def summarize_project(state: ProjectState) -> ProjectState:
+    response = await model.ainvoke([
+        SystemMessage(
+            "You are a team supervisor. Your engineers have reported back. "
+            "Return a summary of the entire project and instructions on how to run it."
+        ),
+        HumanMessage("\n\n".join(state["reports"])),
+    ])
+    return {"summary": response.content}
+
+workflow = StateGraph(ProjectState)
+workflow.add_node("planner", plan_project)
+workflow.add_node("backend_swe", run_engineer(backend_swe_agent))
+workflow.add_node("frontend_swe", run_engineer(frontend_swe_agent))
+workflow.add_node("summarizer", summarize_project)
+workflow.add_edge(START, "planner")
+workflow.add_conditional_edges("planner", assign_tasks, ["backend_swe", "frontend_swe"])
+workflow.add_edge(["backend_swe", "frontend_swe"], "summarizer")
+workflow.add_edge("summarizer", END)
 
 # checkpointer = InMemorySaver()
 # store = InMemoryStore()
@@ -108,14 +227,9 @@ app = workflow.compile(
     # checkpointer=checkpointer,
     # store=store
 )
-result = app.invoke({
-    "messages": [
-        {
-            "role": "user",
-            "content": "Make a frontend and backend for a todo app using python."
-        }
-    ]
-})
+request = HumanMessage(content="Make a frontend and backend for a todo app using python.")
+# The tools are async, so the graph has to run on an event loop
+result = asyncio.run(app.ainvoke({"messages": [request]}))
 
 print(result)
 
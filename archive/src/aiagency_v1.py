@@ -38,6 +38,10 @@ council_model = LoggingChatOpenAI(caller="council", model=MODEL_NAME, temperatur
 
 # Define the workspace path
 WORKSPACE_PATH = "agent_workspace"
+os.makedirs(WORKSPACE_PATH, exist_ok=True)
+
+# Upper bound on graph hops per run to stop runaway plans
+MAX_HOPS = 200
 
 # Schema definitions
 class Task(BaseModel):
@@ -234,6 +238,37 @@ Guidelines for discussion:
 The meeting ends when all participants have declared READY and provided their summaries.
 """
 
+_IMPLEMENTATION_PROMPT_TEMPLATE = """
+Project: {project_description}
+
+Your current task is: {description}
+
+Please implement this task in the {project_name} project. Create all necessary files and directories.
+Provide a summary of what you've implemented when complete.
+"""
+
+_FRONTEND_SUMMARY_TEMPLATE = """
+I've completed the task: {description}
+
+Implementation details:
+- Created frontend components in {project_name}/frontend/
+- Implemented the requested functionality
+- Added necessary files and directories
+
+The implementation is now ready for review or integration.
+"""
+
+_BACKEND_SUMMARY_TEMPLATE = """
+I've completed the task: {description}
+
+Implementation details:
+- Created backend components in {project_name}/backend/
+- Implemented the requested functionality
+- Added necessary files and directories
+
+The implementation is now ready for review or integration.
+"""
+
 # Council Meeting Implementation
 def create_council_meeting(
     state: Dict[str, Any], 
@@ -609,14 +644,11 @@ def frontend_agent(state: Dict[str, Any]) -> Dict[str, Any]:
             # Generate implementation plan
             implementation_prompt = [
                 SystemMessage(content=FRONTEND_SYSTEM_PROMPT),
-                HumanMessage(content=f"""
-Project: {project_description}
-
-Your current task is: {current_task['description']}
-
-Please implement this task in the {project_name} project. Create all necessary files and directories.
-Provide a summary of what you've implemented when complete.
-""")
+                HumanMessage(content=_IMPLEMENTATION_PROMPT_TEMPLATE.format_map({
+                    "project_description": project_description,
+                    "description": current_task["description"],
+                    "project_name": project_name
+                }))
             ]
             
             # Use a dedicated frontend model with logging
@@ -685,16 +717,10 @@ Provide a summary of what you've implemented when complete.
             state["tasks"][task_idx]["status"] = "completed"
             
             # Add a summary message
-            summary = f"""
-I've completed the task: {current_task['description']}
-
-Implementation details:
-- Created frontend components in {project_name}/frontend/
-- Implemented the requested functionality
-- Added necessary files and directories
-
-The implementation is now ready for review or integration.
-"""
+            summary = _FRONTEND_SUMMARY_TEMPLATE.format_map({
+                "description": current_task["description"],
+                "project_name": project_name
+            })
             state["messages"].append({
                 "role": "assistant",
                 "content": summary,
@@ -731,14 +757,11 @@ def backend_agent(state: Dict[str, Any]) -> Dict[str, Any]:
             # Generate implementation plan
             implementation_prompt = [
                 SystemMessage(content=BACKEND_SYSTEM_PROMPT),
-                HumanMessage(content=f"""
-Project: {project_description}
-
-Your current task is: {current_task['description']}
-
-Please implement this task in the {project_name} project. Create all necessary files and directories.
-Provide a summary of what you've implemented when complete.
-""")
+                HumanMessage(content=_IMPLEMENTATION_PROMPT_TEMPLATE.format_map({
+                    "project_description": project_description,
+                    "description": current_task["description"],
+                    "project_name": project_name
+                }))
             ]
             
             # Use a dedicated backend model with logging
@@ -807,16 +830,10 @@ Provide a summary of what you've implemented when complete.
             state["tasks"][task_idx]["status"] = "completed"
             
             # Add a summary message
-            summary = f"""
-I've completed the task: {current_task['description']}
-
-Implementation details:
-- Created backend components in {project_name}/backend/
-- Implemented the requested functionality
-- Added necessary files and directories
-
-The implementation is now ready for review or integration.
-"""
+            summary = _BACKEND_SUMMARY_TEMPLATE.format_map({
+                "description": current_task["description"],
+                "project_name": project_name
+            })
             state["messages"].append({
                 "role": "assistant",
                 "content": summary,
@@ -880,6 +897,45 @@ def get_next_agent(state: Dict[str, Any]) -> str:
     # Default to supervisor
     return "supervisor"
 
+def _council_in_progress(state: Dict[str, Any]) -> bool:
+    """
+    Check whether the current council meeting is still in progress.
+    
+    Args:
+        state: Current state of the system
+        
+    Returns:
+        True if there is an active council meeting that has not concluded
+    """
+    council_id = state.get("current_council")
+    if not council_id:
+        return False
+    council = next((m for m in state["council_meetings"] if m["meeting_id"] == council_id), None)
+    return bool(council) and council["status"] == "in_progress"
+
+def _next_task_agent(state: Dict[str, Any]) -> Optional[str]:
+    """
+    Find the worker agent that owns the next unfinished task.
+    
+    Args:
+        state: Current state of the system
+        
+    Returns:
+        "frontend" or "backend", or None if no worker has pending tasks
+    """
+    if state.get("status") != "in_progress" or not state.get("tasks"):
+        return None
+    
+    # Prefer in-progress tasks, then not started tasks
+    for status in ("in_progress", "not_started"):
+        task = next((t for t in state["tasks"] if t.get("status") == status), None)
+        if task:
+            # Make sure we're routing to a valid agent
+            agent = task.get("assigned_to")
+            if agent in ("frontend", "backend"):
+                return agent
+    return None
+
 def router(state: Dict[str, Any]) -> str:
     """
     Route to the next agent based on the current state.
@@ -895,37 +951,57 @@ def router(state: Dict[str, Any]) -> str:
         return END
     
     # If there's an active council meeting, prioritize it
-    if state.get("current_council"):
-        council_id = state["current_council"]
-        council = next((m for m in state["council_meetings"] if m["meeting_id"] == council_id), None)
-        
-        if council and council["status"] == "in_progress":
-            return "council"
+    if _council_in_progress(state):
+        return "council"
     
     # If we're just starting or planning, prioritize the supervisor
     if state.get("status") in ["not_started", "planning"]:
         return "supervisor"
     
     # If we're in progress, check for tasks to complete
-    if state.get("status") == "in_progress" and state.get("tasks", []):
-        # Check for in-progress tasks first
-        in_progress_tasks = [t for t in state["tasks"] if t.get("status") == "in_progress"]
-        if in_progress_tasks:
-            # Make sure we're routing to a valid agent
-            agent = in_progress_tasks[0].get("assigned_to")
-            if agent in ["frontend", "backend"]:
-                return agent
+    # Default to supervisor for any other case
+    return _next_task_agent(state) or "supervisor"
+
+def route_from_supervisor(state: Dict[str, Any]) -> str:
+    """
+    Route after the supervisor acts. Every destination is reachable from here.
+    
+    Args:
+        state: Current state of the system
         
-        # Check for not started tasks
-        not_started_tasks = [t for t in state["tasks"] if t.get("status") == "not_started"]
-        if not_started_tasks:
-            # Make sure we're routing to a valid agent
-            agent = not_started_tasks[0].get("assigned_to")
-            if agent in ["frontend", "backend"]:
-                return agent
+    Returns:
+        The name of the next node in the graph
+    """
+    return router(state)
+
+def route_from_council(state: Dict[str, Any]) -> str:
+    """
+    Route after a council turn: keep meeting or hand back to the supervisor.
     
-    # Default to supervisor for any other case
-    return "supervisor"
+    Args:
+        state: Current state of the system
+        
+    Returns:
+        "council" while the meeting is in progress, otherwise "supervisor"
+    """
+    return "council" if _council_in_progress(state) else "supervisor"
+
+def route_from_worker(state: Dict[str, Any]) -> str:
+    """
+    Route after a frontend or backend agent finishes a task.
+    
+    Workers never open council meetings, so only the remaining tasks,
+    the supervisor, or the end of the run are reachable.
+    
+    Args:
+        state: Current state of the system
+        
+    Returns:
+        The name of the next node in the graph
+    """
+    if state.get("status") == "completed":
+        return END
+    return _next_task_agent(state) or "supervisor"
 
 # Build the workflow
 def create_agency_workflow():
@@ -944,11 +1020,16 @@ def create_agency_workflow():
     workflow.add_node("backend", backend_agent)
     workflow.add_node("council", council_agent)
     
-    # Add conditional edges
-    workflow.add_conditional_edges("supervisor", router)
-    workflow.add_conditional_edges("frontend", router)
-    workflow.add_conditional_edges("backend", router)
-    workflow.add_conditional_edges("council", router)
+    # Add conditional edges, each limited to the destinations reachable from its node
+    worker_destinations = {"frontend": "frontend", "backend": "backend", "supervisor": "supervisor", END: END}
+    workflow.add_conditional_edges(
+        "supervisor",
+        route_from_supervisor,
+        {"supervisor": "supervisor", "council": "council", "frontend": "frontend", "backend": "backend", END: END},
+    )
+    workflow.add_conditional_edges("frontend", route_from_worker, worker_destinations)
+    workflow.add_conditional_edges("backend", route_from_worker, worker_destinations)
+    workflow.add_conditional_edges("council", route_from_council, {"council": "council", "supervisor": "supervisor"})
     
     # Set the entry point
     workflow.set_entry_point("supervisor")
@@ -956,6 +1037,33 @@ def create_agency_workflow():
     # Compile the graph without recursion_limit which is not supported
     return workflow.compile()
 
+def _build_error_state(user_message: str, e: Exception) -> Dict[str, Any]:
+    """
+    Build the state returned when the workflow fails.
+    
+    Args:
+        user_message: The user's request
+        e: The exception raised during workflow execution
+        
+    Returns:
+        A partial state containing the error message
+    """
+    print(f"Error during workflow execution: {str(e)}")
+    return {
+        "messages": [
+            {
+                "role": "user",
+                "content": user_message
+            },
+            {
+                "role": "assistant",
+                "content": f"I encountered an error while processing your request: {str(e)}",
+                "agent": "supervisor"
+            }
+        ],
+        "status": "error"
+    }
+
 # Run the workflow
 def run_agency(user_message: str) -> Dict[str, Any]:
     """
@@ -967,15 +1075,6 @@ def run_agency(user_message: str) -> Dict[str, Any]:
     Returns:
         The final state of the system
     """
-    # Create the workspace directory if it doesn't exist
-    os.makedirs(WORKSPACE_PATH, exist_ok=True)
-    
-    # Set a global Python recursion limit if needed
-    # This won't directly affect LangGraph but will prevent Python stack overflow
-    import sys
-    original_recursion_limit = sys.getrecursionlimit()
-    sys.setrecursionlimit(3000)  # Increase Python's recursion limit
-    
     try:
         # Initialize the workflow
         workflow = create_agency_workflow()
@@ -991,32 +1090,18 @@ def run_agency(user_message: str) -> Dict[str, Any]:
             "status": "not_started"
         }
         
-        # Run the workflow with a timeout to prevent infinite loops
+        # Drive the graph one hop at a time so runaway plans are bounded by MAX_HOPS
         print("Starting workflow execution...")
-        final_state = workflow.invoke(state)
+        events = workflow.stream(state, config={"recursion_limit": MAX_HOPS + 1}, stream_mode="values")
+        for _hop, event in zip(range(MAX_HOPS), events):
+            state = event
+            if state.get("status") in ("completed", "error"):
+                break
         print("Workflow execution completed.")
         
-        return final_state
+        return state
     except Exception as e:
-        print(f"Error during workflow execution: {str(e)}")
-        # Return a partial state or error state
-        return {
-            "messages": [
-                {
-                    "role": "user",
-                    "content": user_message
-                },
-                {
-                    "role": "assistant",
-                    "content": f"I encountered an error while processing your request: {str(e)}",
-                    "agent": "supervisor"
-                }
-            ],
-            "status": "error"
-        }
-    finally:
-        # Restore original recursion limit
-        sys.setrecursionlimit(original_recursion_limit)
+        return _build_error_state(user_message, e)
 
 # Example usage
 if __name__ == "__main__":
@@ -1,11 +1,18 @@
 import asyncio
 
 from crawlee.crawlers import BeautifulSoupCrawler, BeautifulSoupCrawlingContext
-from markdownify import markdownify as md
 from markdownify import MarkdownConverter
 
+# One converter for every page; it walks the parsed soup directly instead of re-parsing serialized HTML
+converter = MarkdownConverter()
+
+# Page chrome that only adds noise to the markdown
+BOILERPLATE_SELECTOR = 'nav, footer, script, style'
+
 async def main() -> None:
     crawler = BeautifulSoupCrawler(
+        # libxml2-based parser, much faster than the default pure-Python html.parser
+        parser='lxml',
         # Limit the crawl to max requests. Remove or increase it for crawling all links.
         max_requests_per_crawl=10,
     )
@@ -15,19 +22,22 @@ async def main() -> None:
     async def request_handler(context: BeautifulSoupCrawlingContext) -> None:
         context.log.info(f'Processing {context.request.url} ...')
 
+        # Enqueue all links found on the page, before navigation is stripped below.
+        await context.enqueue_links()
+
+        for element in context.soup.select(BOILERPLATE_SELECTOR):
+            element.decompose()
+
         # Extract data from the page.
         data = {
             'url': context.request.url,
             'title': context.soup.title.string if context.soup.title else None,
-            'markdown': md(str(context.soup)),
+            'markdown': converter.convert_soup(context.soup),
         }
 
         # Push the extracted data to the default dataset.
         await context.push_data(data)
 
-        # Enqueue all links found on the page.
-        await context.enqueue_links()
-
     # Run the crawler with the initial list of URLs.
     await crawler.run(['https://crawlee.dev'])
     await crawler.export_data_json('crawlee_data.json')
@@ -39,6 +49,12 @@ async def main() -> None:
         f.write(data.items[0]['markdown'])
 
 if __name__ == '__main__':
+    # uvloop's event loop is faster for the crawler's many concurrent requests; it's optional
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
     asyncio.run(main())
     
     
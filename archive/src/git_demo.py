@@ -1,3 +1,4 @@
+import os
 from git import Repo
 
 # repo = Repo.init('/mnt/pccfs2/backed_up/justinolcott/aiagency/agent_workspace', )
@@ -9,13 +10,16 @@ subprocess.run([
     "/mnt/pccfs2/backed_up/justinolcott/aiagency/agent_workspace"
 ])
 
-# make a new file
-with open('/mnt/pccfs2/backed_up/justinolcott/aiagency/agent_workspace/test.txt', 'w') as f:
-    f.write('hello world')
+# make new files
+new_files = {'test.txt': 'hello world'}
+for path, content in new_files.items():
+    with open(os.path.join(repo.working_tree_dir, path), 'w') as f:
+        f.write(content)
     
-# add the file to the repo
-repo.index.add(['test.txt'])
-repo.index.commit('added test.txt')
+# stage everything in memory, then write the index to disk once
+repo.index.add(list(new_files), write=False)
+repo.index.write()
+repo.index.commit('added ' + ', '.join(new_files))
 
 print(repo.head.commit.message)
 
@@ -28,14 +32,13 @@ for diff in diffs:
 from langchain_community.document_loaders import GitLoader
 
 branch = repo.head.reference
-loader = GitLoader(repo_path='/mnt/pccfs2/backed_up/justinolcott/aiagency/agent_workspace', branch=branch)
+# only load text sources, skipping binary/LFS blobs
+loader = GitLoader(
+    repo_path='/mnt/pccfs2/backed_up/justinolcott/aiagency/agent_workspace',
+    branch=branch,
+    file_filter=lambda file_path: file_path.endswith((".py", ".md", ".txt")),
+)
 data = loader.load()
 
 print(data)
 print(data[0].page_content)
-
-# e.g. loading only python files
-# loader = GitLoader(
-#     repo_path="./example_data/test_repo1/",
-#     file_filter=lambda file_path: file_path.endswith(".py"),
-# )
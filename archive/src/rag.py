@@ -1,36 +1,282 @@
 from langchain_huggingface import HuggingFaceEmbeddings  # noqa: F401
 
 from langchain_core.embeddings.embeddings import Embeddings
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
 
 from transformers import AutoTokenizer, AutoModel  # noqa: F401
 import torch
 import torch.nn.functional as F
+import functools
+import hashlib
+import importlib.util
+import sqlite3
+import uuid
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
 import warnings
 warnings.filterwarnings("ignore", message="To copy construct from a tensor, it is recommended to use sourceTensor.clone().detach()")
 
+# This module only runs inference
+torch.set_grad_enabled(False)
+
+MODEL_NAME = 'nvidia/NV-Embed-v2'
+
+# faiss is optional; when it's installed the vector store searches an HNSW graph instead of scanning every vector
+HAS_FAISS = importlib.util.find_spec('faiss') is not None
+
+class TokenizerCache:
+    """Wraps a tokenizer with an LRU cache of each text's token ids, so embedding the same text again
+    skips tokenization; cached ids are batched with the tokenizer's own pad()"""
+    # Arguments that apply when batching the ids rather than when tokenizing each text
+    PAD_KWARGS = ('padding', 'max_length', 'pad_to_multiple_of', 'return_attention_mask', 'return_tensors')
+
+    def __init__(self, tokenizer, max_entries: int = 10000):
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+
+    def __getattr__(self, name):
+        return getattr(self.tokenizer, name)
+
+    def __call__(self, text, **kwargs):
+        if isinstance(text, str) or any(kwargs.get(k) for k in ('text_pair', 'return_offsets_mapping', 'return_overflowing_tokens')):
+            return self.tokenizer(text, **kwargs)
+
+        pad_kwargs = {k: kwargs[k] for k in self.PAD_KWARGS if k in kwargs}
+        # pad() only uses max_length when padding to it, and warns about it otherwise
+        if pad_kwargs.get('padding') != 'max_length':
+            pad_kwargs.pop('max_length', None)
+        return_length = kwargs.pop('return_length', False)
+        tokenize_kwargs = {k: v for k, v in kwargs.items() if k not in self.PAD_KWARGS or k == 'max_length'}
+        settings = repr(sorted(tokenize_kwargs.items())).encode()
+
+        keys = [hashlib.blake2b(settings + t.encode(), digest_size=16).digest() for t in text]
+        misses = {key: t for key, t in zip(keys, text) if key not in self.cache}
+        if misses:
+            for key, ids in zip(misses, self.tokenizer(list(misses.values()), **tokenize_kwargs)['input_ids']):
+                self.cache[key] = ids
+        input_ids = [self.cache[key] for key in keys]
+        for key in keys:
+            self.cache.move_to_end(key)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+
+        encoding = self.tokenizer.pad({'input_ids': input_ids}, **pad_kwargs)
+        if return_length:
+            encoding['length'] = [len(ids) for ids in input_ids]
+        return encoding
+
 class CustomEmbeddingModel(Embeddings):
-    def __init__(self):
-        self.model = AutoModel.from_pretrained('nvidia/NV-Embed-v2', trust_remote_code=True, device_map='auto')
+    def __init__(self, compile: bool = False):
+        # Half precision on GPU: bf16 where supported, otherwise fp16
+        if torch.cuda.is_available():
+            self.dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        else:
+            self.dtype = torch.float32
+        # Fused attention that never materializes the full attention matrix: FlashAttention-2 if it's
+        # installed (it needs a GPU and half precision), otherwise PyTorch's SDPA kernels
+        if torch.cuda.is_available() and importlib.util.find_spec('flash_attn') is not None:
+            attn_implementation = 'flash_attention_2'
+        else:
+            attn_implementation = 'sdpa'
+        self.model = AutoModel.from_pretrained(
+            MODEL_NAME, trust_remote_code=True, device_map='auto', torch_dtype=self.dtype, attn_implementation=attn_implementation
+        )
+        self.model.eval()
+        if compile:
+            # encode() tokenizes and then calls forward, so compile forward in place. Batches are
+            # padded to their longest text, so compile for dynamic shapes rather than one graph per length
+            self.model.forward = torch.compile(self.model.forward, dynamic=True)
 
         self.max_length = 32768
         self.model.tokenizer.padding_side = 'right'
-        self.batch_size = 1
+        self.model.tokenizer = TokenizerCache(self.model.tokenizer)
+        self.batch_size = 16
+        # Cap on padded tokens per batch (longest text in the batch x batch size)
+        self.max_batch_tokens = 16384
+    
+    def _batches(self, texts: list[str]):
+        """Group text indices into batches of similar token length, so padding doesn't dominate"""
+        # Tokenize exactly as model.encode does (it appends eos and drops token type ids), so these
+        # ids are the ones encode finds in the tokenizer cache
+        eos = self.model.tokenizer.eos_token
+        lengths = self.model.tokenizer(
+            [text + eos for text in texts], truncation=True, max_length=self.max_length, return_token_type_ids=False, return_length=True
+        )['length']
+        batch = []
+        # In ascending length order, each new text is the longest in its batch
+        for i in sorted(range(len(texts)), key=lengths.__getitem__):
+            if batch and (len(batch) >= self.batch_size or lengths[i] * (len(batch) + 1) > self.max_batch_tokens):
+                yield batch
+                batch = []
+            batch.append(i)
+        if batch:
+            yield batch
+
+    def _encode(self, texts: list[str]) -> torch.Tensor:
+        """Embed texts in half precision, then normalize in fp32 for stability"""
+        with torch.inference_mode(), torch.autocast('cuda', dtype=self.dtype, enabled=torch.cuda.is_available()):
+            e = self.model.encode(texts, instruction='', max_length=self.max_length)
+        return F.normalize(e.float(), p=2, dim=1)
         
-    def embed_documents(self, texts: list[str]) -> list[list[float]]:
-        embeddings = []
-        for i in range(0, len(texts), self.batch_size):
-            batch_texts = texts[i:i+self.batch_size]
-            with torch.no_grad():
-                e = self.model.encode(batch_texts, instruction='', max_length=self.max_length)
-                e = F.normalize(e, p=2, dim=1)
-                embeddings.extend(e.cpu().numpy())
+    def embed_documents_array(self, texts: list[str]) -> np.ndarray:
+        """Embed a non-empty list of texts as one (len(texts), D) float32 matrix"""
+        # Each batch's result is copied to pinned host memory on a side stream, so the copy overlaps
+        # the next batch's tokenization and forward pass; we only wait for the copies at the end
+        copy_stream = None
+        results = []
+        for batch in self._batches(texts):
+            e = self._encode([texts[i] for i in batch])
+            if e.is_cuda:
+                if copy_stream is None:
+                    copy_stream = torch.cuda.Stream(device=e.device)
+                host = torch.empty(e.shape, dtype=e.dtype, pin_memory=True)
+                copy_stream.wait_stream(torch.cuda.current_stream(e.device))
+                with torch.cuda.stream(copy_stream):
+                    host.copy_(e, non_blocking=True)
+                    e.record_stream(copy_stream)
+                e = host
+            results.append((batch, e))
+        if copy_stream is not None:
+            copy_stream.synchronize()
+
+        embeddings = np.empty((len(texts), results[0][1].shape[1]), dtype=np.float32)
+        for batch, e in results:
+            # Put each embedding back at its text's position
+            embeddings[batch] = e.numpy()
         return embeddings
 
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        # LangChain's interface takes lists; callers in this module use the matrix from embed_documents_array
+        if not texts:
+            return []
+        return self.embed_documents_array(texts).tolist()
+
     def embed_query(self, text: str) -> list[float]:
-        with torch.no_grad():
-            embedding = self.model.encode([text], instruction='', max_length=self.max_length)
-            embedding = F.normalize(embedding, p=2, dim=1)
-        return embedding.cpu().numpy()[0]
+        return self._encode([text]).cpu().numpy()[0].tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embedding model with an on-disk cache of float16 vectors keyed by content hash,
+    so re-indexing unchanged text doesn't run the model again"""
+    def __init__(self, embeddings: Embeddings, path: str = 'embedding_cache.sqlite', namespace: str = MODEL_NAME):
+        self.embeddings = embeddings
+        # Part of every key, so vectors from a different model are never returned
+        self.namespace = namespace.encode()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)')
+
+    def _embed(self, texts: list[str], kind: bytes, embed_misses) -> np.ndarray:
+        keys = [hashlib.sha256(self.namespace + b'\0' + kind + b'\0' + text.encode()).digest() for text in texts]
+        vectors = {}
+        unique_keys = list(dict.fromkeys(keys))
+        # Look up in chunks to stay under SQLite's limit on query parameters
+        for i in range(0, len(unique_keys), 500):
+            chunk = unique_keys[i:i+500]
+            rows = self.db.execute(f'SELECT key, vector FROM embeddings WHERE key IN ({",".join("?" * len(chunk))})', chunk)
+            vectors.update((key, np.frombuffer(vector, dtype=np.float16)) for key, vector in rows)
+
+        misses = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if misses:
+            computed = np.asarray(embed_misses(list(misses.values())), dtype=np.float16)
+            with self.db:
+                self.db.executemany('INSERT OR REPLACE INTO embeddings VALUES (?, ?)', [(key, v.tobytes()) for key, v in zip(misses, computed)])
+            vectors.update(zip(misses, computed))
+        return np.stack([vectors[key] for key in keys]).astype(np.float32)
+
+    def embed_documents_array(self, texts: list[str]) -> np.ndarray:
+        """Embed a non-empty list of texts as one (len(texts), D) float32 matrix"""
+        # Misses go through the wrapped model's matrix path when it has one
+        embed_misses = getattr(self.embeddings, 'embed_documents_array', self.embeddings.embed_documents)
+        return self._embed(texts, b'document', embed_misses)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        return self.embed_documents_array(texts).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed([text], b'query', lambda misses: [self.embeddings.embed_query(misses[0])])[0].tolist()
+
+
+class QuantizedVectorStore(VectorStore):
+    """In-memory vector store keeping each embedding as int8 with a per-vector float16 scale,
+    a quarter of the memory of float32 vectors"""
+    # Rows dequantized at a time while scoring, bounding the temporary float32 copy
+    search_chunk_size = 4096
+    # Links per node in the HNSW graph
+    hnsw_m = 32
+
+    def __init__(self, embedding: Embeddings):
+        self.embedding = embedding
+        self.documents: list[Document] = []
+        self.vectors: Optional[np.ndarray] = None  # (N, D) int8
+        self.scales: Optional[np.ndarray] = None  # (N,) float16
+        # HNSW index over the dequantized vectors; it holds float32 copies, so it trades memory for sublinear search
+        self.index = None
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs) -> list[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        self.documents.extend(Document(id=id_, page_content=text, metadata=metadata) for id_, text, metadata in zip(ids, texts, metadatas))
+
+        # Take the embedding matrix directly when the model offers one, skipping the list round trip
+        embed = getattr(self.embedding, 'embed_documents_array', self.embedding.embed_documents)
+        v = np.asarray(embed(texts), dtype=np.float32)
+        scales = np.abs(v).max(axis=1) / 127
+        scales[scales == 0] = 1
+        q = np.round(v / scales[:, None]).astype(np.int8)
+        scales = scales.astype(np.float16)
+        if self.vectors is None:
+            self.vectors, self.scales = q, scales
+        else:
+            self.vectors = np.concatenate([self.vectors, q])
+            self.scales = np.concatenate([self.scales, scales])
+        if HAS_FAISS:
+            import faiss
+            if self.index is None:
+                self.index = faiss.IndexHNSWFlat(q.shape[1], self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            # Index the dequantized values so scores match the exact scan below
+            self.index.add(q.astype(np.float32) * scales.astype(np.float32)[:, None])
+        return ids
+
+    def similarity_search_with_score_by_vector(self, embedding, k: int = 4) -> list[tuple[Document, float]]:
+        if self.vectors is None:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        if self.index is not None:
+            scores, top = self.index.search(query[None, :], k)
+            return [(self.documents[i], float(score)) for i, score in zip(top[0], scores[0]) if i != -1]
+        scores = np.empty(len(self.vectors), dtype=np.float32)
+        for i in range(0, len(self.vectors), self.search_chunk_size):
+            scores[i:i+self.search_chunk_size] = self.vectors[i:i+self.search_chunk_size].astype(np.float32) @ query
+        # Each stored vector is its int8 values times its scale; embeddings are normalized, so this is cosine similarity
+        scores *= self.scales
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.documents[i], float(scores[i])) for i in top]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, **kwargs) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> list[Document]:
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs) -> 'QuantizedVectorStore':
+        store = cls(embedding)
+        store.add_texts(texts, metadatas, **kwargs)
+        return store
     
 
 # # model_name = "nvidia/NV-Embed-v2"
@@ -42,12 +288,23 @@ class CustomEmbeddingModel(Embeddings):
 #     model_kwargs=model_kwargs,
 #     encode_kwargs=encode_kwargs
 # )
-embeddings = CustomEmbeddingModel()
+# Loading NV-Embed-v2 takes a while, so the model and vector store are only built on first use;
+# `rag.embeddings` and `rag.vector_store` still work as module attributes via __getattr__
+@functools.cache
+def get_embeddings() -> CachedEmbeddings:
+    return CachedEmbeddings(CustomEmbeddingModel())
 
-from langchain_core.vectorstores import InMemoryVectorStore
-vector_store = InMemoryVectorStore(embeddings)
+@functools.cache
+def get_vector_store() -> QuantizedVectorStore:
+    return QuantizedVectorStore(get_embeddings())
+
+def __getattr__(name: str):
+    if name == 'embeddings':
+        return get_embeddings()
+    if name == 'vector_store':
+        return get_vector_store()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
@@ -57,12 +314,25 @@ text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=10
 import asyncio
 
 from crawlee.crawlers import BeautifulSoupCrawler, BeautifulSoupCrawlingContext
-from markdownify import markdownify as md
+from markdownify import MarkdownConverter
+
+# One converter for every page; it walks the parsed soup directly instead of re-parsing serialized HTML
+converter = MarkdownConverter()
+
+# Page chrome that only adds noise to the markdown
+BOILERPLATE_SELECTOR = 'nav, footer, script, style'
 
 docs = []
 
 async def main() -> None:
+    # Chunks of each crawled page, or None once the crawl is done
+    chunk_queue: asyncio.Queue = asyncio.Queue()
+    # Digests of chunks already queued; pages repeat headers and overlapping text, which only needs embedding once
+    seen: set[bytes] = set()
+
     crawler = BeautifulSoupCrawler(
+        # libxml2-based parser, much faster than the default pure-Python html.parser
+        parser='lxml',
         # Limit the crawl to max requests. Remove or increase it for crawling all links.
         max_requests_per_crawl=1,
     )
@@ -72,25 +342,54 @@ async def main() -> None:
     async def request_handler(context: BeautifulSoupCrawlingContext) -> None:
         context.log.info(f'Processing {context.request.url} ...')
 
+        # Enqueue all links found on the page, before navigation is stripped below.
+        await context.enqueue_links()
+
+        for element in context.soup.select(BOILERPLATE_SELECTOR):
+            element.decompose()
+
         # Extract data from the page.
         data = {
             'url': context.request.url,
             'title': context.soup.title.string if context.soup.title else None,
-            'markdown': md(str(context.soup)),
+            'markdown': converter.convert_soup(context.soup),
         }
         
         
-        docs.extend(text_splitter.split_documents([Document(page_content=data['markdown'])]))
-        
+        chunks = []
+        for chunk in text_splitter.split_documents([Document(page_content=data['markdown'])]):
+            digest = hashlib.blake2b(chunk.page_content.encode(), digest_size=16).digest()
+            if digest not in seen:
+                seen.add(digest)
+                chunks.append(chunk)
+        docs.extend(chunks)
+        chunk_queue.put_nowait(chunks)
 
         # Push the extracted data to the default dataset.
         await context.push_data(data)
 
-        # Enqueue all links found on the page.
-        await context.enqueue_links()
+    async def crawl() -> None:
+        try:
+            # Run the crawler with the initial list of URLs.
+            await crawler.run(['https://crawlee.dev'])
+        finally:
+            chunk_queue.put_nowait(None)
+
+    async def embed() -> None:
+        """Index chunks while the crawl is still running, so embedding overlaps with page fetches"""
+        done = False
+        while not done:
+            # Take everything queued so far as one batch
+            batch = [await chunk_queue.get()]
+            while not chunk_queue.empty():
+                batch.append(chunk_queue.get_nowait())
+            done = None in batch
+            chunks = [chunk for page in batch if page for chunk in page]
+            if chunks:
+                # Embedding blocks on the GPU, so run it off the event loop
+                await asyncio.to_thread(get_vector_store().add_documents, chunks)
 
-    # Run the crawler with the initial list of URLs.
-    await crawler.run(['https://crawlee.dev'])
+    await asyncio.gather(crawl(), embed())
     await crawler.export_data_json('crawlee_data.json')
     data = await crawler.get_data()
     # crawler.log.info(f'Extracted data: {data.items}')
@@ -102,13 +401,17 @@ async def main() -> None:
 
 if __name__ == '__main__':
     import asyncio
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
     asyncio.run(main())
     print(len(docs))
     
     warnings.filterwarnings("ignore", message="To copy construct from a tensor")
     
-    vector = embeddings.embed_query("What is web scraping?")
+    vector = get_embeddings().embed_query("What is web scraping?")
     print(vector)
-    _ = vector_store.add_documents(docs)
-    retrieved_docs = vector_store.similarity_search_by_vector(vector, 1)
+    retrieved_docs = get_vector_store().similarity_search_by_vector(vector, 1)
     print(retrieved_docs)
@@ -2,41 +2,37 @@ from __future__ import annotations
 
 import os
 import asyncio
-import time
-import uuid
-import yaml
-from uuid import uuid4
-from pathlib import Path
-from typing import Literal, List, Union, Dict, Optional, Any, Protocol
-
-
-
-# import os
-# import asyncio
-# import time
-# import uuid
-# import yaml
+import codecs
+import json
+import re
 import shutil
-import subprocess
-# from uuid import uuid4
-# from pathlib import Path
-# from typing import Literal, List, Union, Dict, Optional, Any, Protocol
-
-
-from pydantic import BaseModel, Field
+import secrets
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import List, Union, Dict, Optional, Any, Protocol
+
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
 
 from pydantic_ai import RunContext, Agent as PydanticAgent
 from pydantic_ai.agent import AgentRunResult
-from pydantic_ai import Agent as PydanticAgent
-from pydantic_ai.messages import ModelMessage, ModelRequest, ModelResponse, ModelRequestPart, ModelResponsePart, ToolReturnPart, TextPart, ToolCallPart, RetryPromptPart
-from pydantic_ai.messages import SystemPromptPart, UserPromptPart, TextPart
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter, ModelRequest, SystemPromptPart, UserPromptPart
 from pydantic_ai.mcp import MCPServerStdio
-
-from pydantic_ai.models.test import TestModel
+from pydantic_ai.models import Model, infer_model
 from pydantic_ai.tools import Tool, ToolDefinition
 
 
+# Directories this process has already created, so repeated agency setup and saves skip the mkdir syscalls
+_KNOWN_DIRS: set = set()
+
+def ensure_dir(path: Union[str, Path]) -> None:
+    path = os.fspath(path)
+    if path not in _KNOWN_DIRS:
+        os.makedirs(path, exist_ok=True)
+        _KNOWN_DIRS.add(path)
 
 
 # MODELS
@@ -44,6 +40,12 @@ from pydantic_ai.tools import Tool, ToolDefinition
 class AgentDependencies:
     agency: 'Agency'
     agent_id: str
+
+@dataclass(slots=True)
+class MeetingLogEntry:
+    agent_name: str
+    agent_id: str
+    message: str
     
     
 
@@ -58,44 +60,65 @@ class MCPServerBase(Protocol):
         
 
 
-class PlaywrightMCPServer:
-    def __init__(self, id: int):
-        self.id = id
-        self.profile_dir = Path(f"./tmp/profile_{id}").resolve()
-        self._server = MCPServerStdio(
-            "npx",
-            args=[
-                "@playwright/mcp@latest",
-                "--headless",
-                "--browser=firefox",
-                f"--user-data-dir={self.profile_dir}"
-            ]
-        )
+class StdioMCPServer:
+    """Persistent wrapper around an MCPServerStdio subprocess.
+    
+    The subprocess and MCP handshake happen once in connect(); list_tools/call_tool
+    reuse that session until disconnect().
+    """
+    def __init__(self, server: MCPServerStdio):
+        self._server = server
+        self._entered: Optional[MCPServerStdio] = None
+
+    async def connect(self) -> MCPServerStdio:
+        if self._entered is None:
+            self._entered = await self._server.__aenter__()
+        return self._entered
+
+    async def disconnect(self) -> None:
+        if self._entered is None:
+            return
+        self._entered = None
+        await self._server.__aexit__(None, None, None)
 
     async def __aenter__(self):
-        return await self._server.__aenter__()
+        return await self.connect()
 
     async def __aexit__(self, exc_type, exc, tb):
-        return await self._server.__aexit__(exc_type, exc, tb)
+        await self.disconnect()
 
     def get(self) -> MCPServerStdio:
         return self._server
 
     async def list_tools(self):
-        return await self._server.list_tools()
+        return await (self._entered or self._server).list_tools()
 
     async def call_tool(self, tool_name, arguments):
-        return await self._server.call_tool(tool_name, arguments)
+        return await (self._entered or self._server).call_tool(tool_name, arguments)
 
     @property
     def is_running(self):
-        return True
+        return self._entered is not None
 
-class PythonMCPServer:
+class PlaywrightMCPServer(StdioMCPServer):
+    def __init__(self, id: int):
+        self.id = id
+        self.profile_dir = Path(f"./tmp/profile_{id}").resolve()
+        super().__init__(MCPServerStdio(
+            "npx",
+            args=[
+                "@playwright/mcp@latest",
+                "--headless",
+                "--browser=firefox",
+                f"--user-data-dir={self.profile_dir}"
+            ]
+        ))
+
+class PythonMCPServer(StdioMCPServer):
     """MCP server for executing Python code in a sandboxed environment using Pyodide."""
     def __init__(self, id: int):
         self.id = id
-        self._server = MCPServerStdio(
+        super().__init__(MCPServerStdio(
             "deno",
             args=[
                 "run",
@@ -106,26 +129,7 @@ class PythonMCPServer:
                 "jsr:@pydantic/mcp-run-python",
                 "stdio"
             ]
-        )
-
-    async def __aenter__(self):
-        return await self._server.__aenter__()
-
-    async def __aexit__(self, exc_type, exc, tb):
-        return await self._server.__aexit__(exc_type, exc, tb)
-
-    def get(self) -> MCPServerStdio:
-        return self._server
-
-    async def list_tools(self):
-        return await self._server.list_tools()
-
-    async def call_tool(self, tool_name, arguments):
-        return await self._server.call_tool(tool_name, arguments)
-
-    @property
-    def is_running(self):
-        return True
+        ))
 
 
 # SERVER MANAGER
@@ -134,12 +138,16 @@ class MCPServerManager:
         self.servers: Dict[str, MCPServerBase] = {}
         self._running_servers: Dict[str, bool] = {}
         self._server_tasks: Dict[str, asyncio.Task] = {}
+        self._ready_events: Dict[str, asyncio.Event] = {}
+        self._stop_events: Dict[str, asyncio.Event] = {}
 
     def add_server(self, server_id: str, server: MCPServerBase):
         self.servers[server_id] = server
         self._running_servers[server_id] = False
+        self._ready_events[server_id] = asyncio.Event()
+        self._stop_events[server_id] = asyncio.Event()
 
-    async def start_server(self, server_id: str) -> bool:
+    async def start_server(self, server_id: str, timeout: float = 120.0) -> bool:
         if server_id not in self.servers:
             print(f"Server {server_id} not found")
             return False
@@ -150,9 +158,30 @@ class MCPServerManager:
         
         # Create task to run the server
         try:
-            self._server_tasks[server_id] = asyncio.create_task(self._run_server(server_id))
-            # Wait briefly to ensure the server starts
-            await asyncio.sleep(1)
+            # Reuse a task that is still starting, e.g. when concurrent agents need the same server
+            server_task = self._server_tasks.get(server_id)
+            if server_task is None or server_task.done():
+                self._stop_events[server_id].clear()
+                server_task = asyncio.create_task(self._run_server(server_id))
+                self._server_tasks[server_id] = server_task
+            
+            # Wait until the server is ready, or its task exits early on error
+            ready_task = asyncio.create_task(self._ready_events[server_id].wait())
+            done, _ = await asyncio.wait({ready_task, server_task}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if ready_task not in done:
+                ready_task.cancel()
+                # Tear the attempt down so a retry starts a fresh task instead of reusing this one
+                server_task.cancel()
+                try:
+                    await server_task
+                except asyncio.CancelledError:
+                    pass
+                if self._server_tasks.get(server_id) is server_task:
+                    del self._server_tasks[server_id]
+                self._ready_events[server_id].clear()
+                print(f"Failed to start server {server_id}: not ready")
+                return False
+            
             self._running_servers[server_id] = True
             print(f"Started MCP server: {server_id}")
             return True
@@ -164,8 +193,8 @@ class MCPServerManager:
         if server_id not in self._server_tasks or not self._running_servers.get(server_id, False):
             return False
         
-        # Cancel the task and wait for it to complete
-        self._server_tasks[server_id].cancel()
+        # Signal the task to leave the server context and wait for it to complete
+        self._stop_events[server_id].set()
         try:
             await self._server_tasks[server_id]
         except asyncio.CancelledError:
@@ -175,16 +204,23 @@ class MCPServerManager:
         return True
 
     async def stop_all_servers(self):
-        for server_id in list(self._server_tasks.keys()):
-            await self.stop_server(server_id)
+        # Stop servers concurrently so one slow shutdown doesn't hold up the rest
+        await asyncio.gather(
+            *(self.stop_server(server_id) for server_id in list(self._server_tasks.keys())),
+            return_exceptions=True,
+        )
 
     async def _run_server(self, server_id: str):
         server = self.servers[server_id]
         try:
+            # The session is entered and exited from this task, which owns it for the server's lifetime
             async with server:
-                # Keep the server running until cancelled
-                while True:
-                    await asyncio.sleep(1)
+                # A single probe once the session is open marks the server as ready
+                await server.list_tools()
+                self._ready_events[server_id].set()
+                # Keep the server running until stop_server signals
+                await self._stop_events[server_id].wait()
+            self._running_servers[server_id] = False
         except asyncio.CancelledError:
             # Handle cancellation
             self._running_servers[server_id] = False
@@ -192,6 +228,8 @@ class MCPServerManager:
         except Exception as e:
             print(f"Server {server_id} error: {e}")
             self._running_servers[server_id] = False
+        finally:
+            self._ready_events[server_id].clear()
 
     def get_server(self, server_id: str) -> Optional[MCPServerBase]:
         return self.servers.get(server_id)
@@ -202,33 +240,31 @@ class MCPServerManager:
     def get_running_servers(self) -> List[str]:
         return [server_id for server_id, running in self._running_servers.items() if running]
 
-    async def wait_for_server_ready(self, server_id: str, timeout: float = 60.0, interval: float = 2.0) -> bool:
-        """Wait for the MCP server to be ready by calling list_tools repeatedly."""
-        server = self.get_server(server_id)
-        if not server:
+    async def wait_for_server_ready(self, server_id: str, timeout: float = 60.0) -> bool:
+        """Wait for the MCP server's session to open and answer its first list_tools call."""
+        if server_id not in self._ready_events:
             print(f"Server {server_id} not found for readiness check")
             return False
-        start = time.time()
-        last_error = None
-        while time.time() - start < timeout:
-            try:
-                # Try to call list_tools (should succeed if server is ready)
-                if hasattr(server, 'list_tools') and callable(getattr(server, 'list_tools')):
-                    result = await server.list_tools()
-                    # If no exception, consider it ready
-                    return True
-                else:
-                    # If no list_tools, just return True after a short wait
-                    await asyncio.sleep(1)
-                    return True
-            except Exception as e:
-                last_error = e
-                await asyncio.sleep(interval)
-        print(f"Timeout waiting for server {server_id} to be ready: {last_error}")
-        return False
+        try:
+            await asyncio.wait_for(self._ready_events[server_id].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            print(f"Timeout waiting for server {server_id} to be ready")
+            return False
 
 
 # TOOLS
+async def prepare_accessible_tool(
+    ctx: RunContext[AgentDependencies], tool_def: ToolDefinition
+) -> Union[ToolDefinition, None]:
+    """Shared prepare for tools gated only on the calling agent's accessible_tools.
+    
+    pydantic-ai awaits prepare hooks, so this stays async, but it never suspends.
+    """
+    if tool_def.name not in ctx.deps.agency.agents[ctx.deps.agent_id].accessible_tool_names:
+        return None
+    return tool_def
+
 def create_new_agent_helper(agency: 'Agency', name: str, system_prompt: str, parent_id: str) -> str:
     new_agent_id = agency.next_id()
     new_agent = Agent(
@@ -245,8 +281,8 @@ def create_new_agent_helper(agency: 'Agency', name: str, system_prompt: str, par
     agency.agents[new_agent_id] = new_agent
 
     if parent_id in agency.agents:
-        new_agent.parent = parent_id
-        agency.agents[parent_id].children[new_agent_id] = new_agent
+        agency.agents[parent_id].add_child(new_agent)
+    agency.mark_state_dirty()
 
     return f"Created agent: {new_agent.name} with ID: {new_agent_id}"
     
@@ -261,11 +297,10 @@ async def prepare_create_new_agent_tool(
     ctx: RunContext[AgentDependencies], tool_def: ToolDefinition
 ) -> Union[ToolDefinition, None]:
     agent: 'Agent' = ctx.deps.agency.agents[ctx.deps.agent_id]
-    current_depth = agent.curr_depth()
-    current_breadth = agent.curr_breadth()
+    current_depth = agent.depth
+    current_breadth = agent.breadth
     
-    if not agent.accessible_tools.get(tool_def.name, False):
-        print(f"Tool {tool_def.name} is not accessible.")
+    if tool_def.name not in agent.accessible_tool_names:
         return None
     
     if current_depth >= agent.agency.max_depth:
@@ -296,10 +331,13 @@ async def remove_agent_helper(agency: 'Agency', agent_id: str) -> str:
     for child_id in agency.agents[agent_id].children.keys():
         child_agent = agency.agents[child_id]
         child_agent.parent_id = None
+        child_agent.depth = 0
+        child_agent.update_subtree_depths()
         agency.agents[child_id] = child_agent      
     
     # remove from agency
     del agency.agents[agent_id]
+    agency.mark_state_dirty()
     
     return f"Removed agent with ID: {agent_id}"
 
@@ -323,8 +361,7 @@ async def prepare_message_agent_tool(
 ) -> Union[ToolDefinition, None]:
     sender_agent: 'Agent' = ctx.deps.agency.agents[ctx.deps.agent_id]
 
-    if not sender_agent.accessible_tools.get(tool_def.name, False):
-        print(f"Tool {tool_def.name} is not accessible.")
+    if tool_def.name not in sender_agent.accessible_tool_names:
         return None
     
     if not sender_agent.children:
@@ -335,6 +372,62 @@ async def prepare_message_agent_tool(
 
 send_message_tool = Tool(message_agent, prepare=prepare_message_agent_tool)
 
+# Message Agents
+async def message_agents_helper(agency: 'Agency', messages: Dict[str, str]) -> str:
+    # Each agent only appends to its own message history, so the runs can overlap safely
+    llm_semaphore = asyncio.Semaphore(agency.max_parallel_llm)
+
+    async def run_one(agent_id: str, message: str) -> str:
+        async with llm_semaphore:
+            return await message_agent_helper(agency, agent_id, message)
+
+    responses = await asyncio.gather(
+        *(run_one(agent_id, message) for agent_id, message in messages.items()),
+        return_exceptions=True,
+    )
+
+    results = []
+    for agent_id, response in zip(messages, responses):
+        if isinstance(response, BaseException):
+            response = f"Error messaging agent {agent_id}: {response}"
+        results.append(f"Response from {agent_id}:\n{response}")
+    return "\n\n".join(results)
+
+async def message_agents(ctx: RunContext[AgentDependencies], messages: Dict[str, str]) -> str:
+    """Send messages to several agents at once. Maps each agent ID to the message it should receive."""
+    agency = ctx.deps.agency
+    return await message_agents_helper(agency, messages)
+
+send_messages_tool = Tool(message_agents, prepare=prepare_message_agent_tool)
+
+CHILD_MEETING_INSTRUCTIONS = """Meeting Instructions:
+- Review the discussion so far
+- Share your thoughts related to the meeting objective
+- Respond to points raised by other participants
+- If you have said all you need to contribute, include "READY_TO_MOVE_ON" in your response
+"""
+
+HOST_MEETING_INSTRUCTIONS = """Meeting Instructions:
+- You are the host of this meeting. You will go first. Begin by elaborating on the objective of the meeting.
+- Review the discussion so far
+- Share your thoughts related to the meeting objective
+- Respond to points raised by other participants
+- If you have said all you need to contribute and want to end the meeting, include "READY_TO_END_MEETING" in your response
+"""
+
+MEETING_END_MESSAGE = "Meeting has ended. Thank you for your participation."
+
+# Read-only stand-in for children's accessible tools while they are in a meeting
+NO_ACCESSIBLE_TOOLS = MappingProxyType({})
+
+# Matches either ready phrase in a single case-insensitive scan of the response
+READY_PHRASE_RE = re.compile(r"READY_TO_(?:END_MEETING|MOVE_ON)", re.IGNORECASE)
+
+# Built once and shared across meetings; parts are never mutated after creation
+CHILD_MEETING_INSTRUCTIONS_PART = UserPromptPart(content=CHILD_MEETING_INSTRUCTIONS)
+HOST_MEETING_INSTRUCTIONS_PART = UserPromptPart(content=HOST_MEETING_INSTRUCTIONS)
+MEETING_END_PART = UserPromptPart(content=MEETING_END_MESSAGE)
+
 async def call_meeting(ctx: RunContext[AgentDependencies], meeting_objective: str, max_turns: int = 15) -> str:
     print("Calling meeting...")
     agency = ctx.deps.agency
@@ -357,86 +450,95 @@ async def call_meeting(ctx: RunContext[AgentDependencies], meeting_objective: st
         tools=host.tools, 
         accessible_tools={}
     )
-    temp_host.message_history = host.message_history.copy()
-    temp_host.message_history.append(
+    # Reuse the host's history as a read-only prefix instead of copying it; the temp host
+    # only stores what is said during the meeting
+    temp_host._history_prefix = host.message_history
+    # The temp host is discarded after the meeting, so its messages stay out of the event log
+    temp_host._log_history = False
+    temp_host.message_history = [
         ModelRequest(
             parts=[
                 UserPromptPart(content=prompt)
             ]
         )
-    )
+    ]
     agency.agents[temp_host_id] = temp_host
     
-    # Temporarily remove the accessible tools from the children
-    original_accessible_tools = {}
+    # Temporarily remove the accessible tools from the children by swapping references
+    original_accessible_tools = {child.id: child.accessible_tools for child in children}
     for child in children:
-        original_accessible_tools[child.id] = child.accessible_tools.copy()
-        child.accessible_tools = {}
+        child.accessible_tools = NO_ACCESSIBLE_TOOLS
     
     participants = [temp_host] + children
 
-    discussion_log = [] # this is for saving and sending back to the host agent as the return of the tool call
+    discussion_log: List[MeetingLogEntry] = [] # this is for saving and sending back to the host agent as the return of the tool call
     
     # Add a meeting initialized message to the log and each of the agents
     meeting_initialized_message = f"Meeting initialized with objective: {meeting_objective}"
-    discussion_log.append({
-        "agent_name": temp_host.name,
-        "agent_id": temp_host.id,
-        "message": meeting_initialized_message,
-    })
-    temp_host.message_history.append(
-        ModelRequest(
-            parts=[
-                UserPromptPart(content=meeting_initialized_message)
-            ]
-        )
-    )
+    discussion_log.append(MeetingLogEntry(temp_host.name, temp_host.id, meeting_initialized_message))
+    # One part object is shared by every participant's history
+    meeting_initialized_part = UserPromptPart(content=meeting_initialized_message)
+    temp_host.message_history.append(ModelRequest(parts=[meeting_initialized_part]))
     for child in children:
-        child.message_history.append(
-            ModelRequest(
-                parts=[
-                    UserPromptPart(content=meeting_initialized_message)
-                ]
-            )
-        )
+        child.append_messages([ModelRequest(parts=[meeting_initialized_part])])
         
     # Add a meeting instructions for each child
     for child in children:
-        child.message_history.append(
-            ModelRequest(
-                parts=[
-                    UserPromptPart(content=\
-f"""Meeting Instructions:
-- Review the discussion so far
-- Share your thoughts related to the meeting objective
-- Respond to points raised by other participants
-- If you have said all you need to contribute, include "READY_TO_MOVE_ON" in your response
-""")
-                ]
-            )
-        )
+        child.append_messages([ModelRequest(parts=[CHILD_MEETING_INSTRUCTIONS_PART])])
         
     # Add a meeting instructions for the host
-    temp_host.message_history.append(
-        ModelRequest(
-            parts=[
-                UserPromptPart(content=\
-f"""Meeting Instructions:
-- You are the host of this meeting. You will go first. Begin by elaborating on the objective of the meeting.
-- Review the discussion so far
-- Share your thoughts related to the meeting objective
-- Respond to points raised by other participants
-- If you have said all you need to contribute and want to end the meeting, include "READY_TO_END_MEETING" in your response
-""")
-            ]
-        )
-    )
+    temp_host.message_history.append(ModelRequest(parts=[HOST_MEETING_INSTRUCTIONS_PART]))
     
     agents_done = set()
     turn = 0
+    
+    # Every turn is appended once to a shared transcript as (speaker id, part); each agent
+    # receives only the tail it hasn't seen yet, minus its own turns, right before it speaks
+    shared_transcript: List[tuple[str, UserPromptPart]] = []
+    last_seen_idx: Dict[str, int] = {agent.id: 0 for agent in participants}
     max_rounds = max_turns * len(participants)
     max_rounds = min(max_rounds, 15)
     
+    # Children speak concurrently within a round, bounded to respect provider rate limits
+    llm_semaphore = asyncio.Semaphore(agency.max_parallel_llm)
+    YOUR_TURN_PHRASE = "It is your turn to speak. Please respond."
+    
+    async def take_turn(agent: Agent) -> str:
+        # Catch the agent up on everything said since its last turn
+        unseen = [part for speaker_id, part in shared_transcript[last_seen_idx[agent.id]:] if speaker_id != agent.id]
+        if unseen:
+            agent.append_messages([ModelRequest(parts=unseen)])
+        last_seen_idx[agent.id] = len(shared_transcript)
+        
+        async with llm_semaphore:
+            result = await agent.run(YOUR_TURN_PHRASE)
+        return result.data.strip() if result and hasattr(result, 'data') else "No response"
+    
+    def record_turn(agent: Agent, outcome: Union[str, BaseException]) -> None:
+        logging_agent_id = agent.id if agent.id != temp_host_id else host_id
+        
+        if isinstance(outcome, BaseException):
+            print(f"Error during agent {agent.id} turn: {str(outcome)}")
+            error_msg = f"Error during response: {str(outcome)}"
+            discussion_log.append(MeetingLogEntry(agent.name, logging_agent_id, error_msg))
+            # Add the agent to agents_done to avoid further errors
+            agents_done.add(agent.id)
+            return
+        
+        response = outcome
+        print(f"Response from {agent.name} ({agent.id}): {response}")
+        
+        # Add the message to the shared transcript
+        shared_transcript.append(
+            (agent.id, UserPromptPart(content=f"From {agent.name} ({logging_agent_id}): {response}"))
+        )
+        
+        # Add the message to the discussion log
+        discussion_log.append(MeetingLogEntry(agent.name, logging_agent_id, response))
+
+        if READY_PHRASE_RE.search(response):
+            agents_done.add(agent.id)
+    
     # print participants
     print("Participants:")
     for agent in participants:
@@ -446,91 +548,60 @@ f"""Meeting Instructions:
     # Host should go first
     print("Starting the meeting...")
     
-    # For each round, allow each agent to speak who isn't done yet
+    # Each round the host speaks first, then every child that isn't done yet speaks concurrently;
+    # children only depend on the host's latest turn, not on each other within a round
     for _ in range(max_rounds):
         if len(agents_done) == len(participants):
             print("✅ All agents are ready to move on.")
             break
-            
-        for agent in participants:
-            # if agent.id in agents_done:
-            #     continue
-                
+        
+        turn += 1
+        print(f"Turn {turn}: {temp_host.name} ({temp_host.id})")
+        try:
+            record_turn(temp_host, await take_turn(temp_host))
+        except Exception as e:
+            record_turn(temp_host, e)
+        
+        speakers = [child for child in children if child.id not in agents_done]
+        for child in speakers:
             turn += 1
-            print(f"Turn {turn}: {agent.name} ({agent.id})")
-            logging_agent_id = agent.id if agent.id != temp_host_id else host_id
+            print(f"Turn {turn}: {child.name} ({child.id})")
+        results = await asyncio.gather(*(take_turn(child) for child in speakers), return_exceptions=True)
+        for child, outcome in zip(speakers, results):
+            record_turn(child, outcome)
             
-            YOUR_TURN_PHRASE = "It is your turn to speak. Please respond."
-            try:
-                result = await agent.run(YOUR_TURN_PHRASE)
-                response = result.data.strip() if result and hasattr(result, 'data') else "No response"
-                
-                print(f"Response: {response}")
-                
-                # Add the message to the other agents' message history
-                for other_agent in participants:
-                    if other_agent.id != agent.id:
-                        other_agent.message_history.append(
-                            ModelRequest(
-                                parts=[
-                                    UserPromptPart(content=f"From {agent.name} ({logging_agent_id}): {response}")
-                                ]
-                            )
-                        )
-                        
-                # Add the message to the discussion log
-                discussion_log.append({
-                    "agent_name": agent.name,
-                    "agent_id": logging_agent_id,
-                    "message": response,
-                })
-
-                if "READY_TO_END_MEETING" in response.upper() or "READY_TO_MOVE_ON" in response.upper():
-                    agents_done.add(agent.id)
-                    
-                if len(agents_done) == len(participants):
-                    print("✅ All agents are ready to move on.")
-                    break
-                    
-            except Exception as e:
-                print(f"Error during agent {agent.id} turn: {str(e)}")
-                error_msg = f"Error during response: {str(e)}"
-                discussion_log.append({
-                    "agent_name": agent.name,
-                    "agent_id": logging_agent_id,
-                    "message": error_msg,
-                })
-                # Add the agent to agents_done to avoid further errors
-                agents_done.add(agent.id)
+        if len(agents_done) == len(participants):
+            print("✅ All agents are ready to move on.")
+            break
                 
         if turn >= max_rounds:
             print("❗ Max rounds reached.")
             break
 
     # Final summary
-    final_summary = "\n".join([
-        f"[{entry['agent_name']} ({entry['agent_id']})]: {entry['message']}"
+    final_summary = "\n".join(
+        f"[{entry.agent_name} ({entry.agent_id})]: {entry.message}"
         for entry in discussion_log
-    ])
+    )
 
     # Restore original accessible tools to the children
     for child in children:
-        child.accessible_tools = original_accessible_tools.get(child.id, {})
+        child.accessible_tools = original_accessible_tools[child.id]
+        
+    # Deliver any turns the children haven't seen yet so their histories are complete
+    for child in children:
+        unseen = [part for speaker_id, part in shared_transcript[last_seen_idx[child.id]:] if speaker_id != child.id]
+        if unseen:
+            child.append_messages([ModelRequest(parts=unseen)])
         
     # Add a meeting end message to each of the agents
-    meeting_end_message = "Meeting has ended. Thank you for your participation."
     for child in children:
-        child.message_history.append(
-            ModelRequest(
-                parts=[
-                    UserPromptPart(content=meeting_end_message)
-                ]
-            )
-        )
+        child.append_messages([ModelRequest(parts=[MEETING_END_PART])])
         
     # Clean up the temporary host agent
     if temp_host_id in agency.agents:
         del agency.agents[temp_host_id]
+    agency.mark_state_dirty()
         
     return f"Meeting complete. Summary:\n\n{final_summary}"
 
@@ -539,8 +610,7 @@ async def prepare_call_meeting_tool(
 ) -> Union[ToolDefinition, None]:
     agent: 'Agent' = ctx.deps.agency.agents[ctx.deps.agent_id]
     
-    if not agent.accessible_tools.get(tool_def.name, False):
-        print(f"Tool {tool_def.name} is not accessible.")
+    if tool_def.name not in agent.accessible_tool_names:
         return None
     
     if not agent.children:
@@ -561,28 +631,10 @@ async def internal_monologue(ctx: RunContext[AgentDependencies], internal_monolo
     # Save the internal monologue to the agent's message history
     return "Internal monologue saved."
 
-async def prepare_internal_monologue_tool(
-    ctx: RunContext[AgentDependencies], tool_def: ToolDefinition
-) -> Optional[ToolDefinition]:
-    agent_id = ctx.deps.agent_id
-    agency = ctx.deps.agency
-    agent = agency.agents[agent_id]
-    
-    if not agent.accessible_tools.get(tool_def.name, False):
-        print(f"Tool {tool_def.name} is not accessible.")
-        return None
-
-    tool_def.description = "Use this for thinking through complex problems step by step before taking action. Your thoughts will be saved but not shown to the user."
-    
-    if 'thought' in tool_def.parameters_json_schema.get('properties', {}):
-        tool_def.parameters_json_schema['properties']['thought']['description'] = "Your detailed thought process, planning, or reasoning steps"
-        
-    return tool_def
-
 internal_monologue_tool = Tool(
     internal_monologue,
-    prepare=prepare_internal_monologue_tool,
-    description="Use this tool to think through complex problems or make plans without outputting to the user."
+    prepare=prepare_accessible_tool,
+    description="Use this for thinking through complex problems step by step before taking action. Your thoughts will be saved but not shown to the user."
 )
 
 
@@ -590,38 +642,74 @@ internal_monologue_tool = Tool(
 # GET FILE, MAKE FILE, EDIT_FILE, DELETE_FILE, LIST_FILES
 # I give the agency access to a folder on the disk. The agency can create, edit, delete, and list files in that folder.
 # FILE TOOLS
+READ_CHUNK_SIZE = 64 * 1024
+LARGE_FILE_SIZE = 1024 * 1024
+
+# Cap on list_files output; larger listings waste tokens and get truncated by the model anyway
+LIST_FILES_MAX_ENTRIES = 500
+
+def _is_in_workspace(agency: 'Agency', full_path: str) -> bool:
+    """Check that a path resolves to somewhere inside the agency's workspace."""
+    full_abs = os.path.realpath(full_path)
+    return os.path.commonpath([full_abs, agency.workspace_abspath]) == agency.workspace_abspath
+
+def _open_in_workspace(agency: 'Agency', file_path: str, full_path: str, flags: int) -> int:
+    """Open a workspace file relative to the agency's open workspace directory, skipping the full path walk."""
+    if agency.workspace_fd is not None:
+        return os.open(file_path, flags, 0o644, dir_fd=agency.workspace_fd)
+    return os.open(full_path, flags, 0o644)
+
+def _write_all(fd: int, data: bytes) -> None:
+    """Write the whole buffer straight to the fd, bypassing the 8 KB text IO buffer."""
+    view = memoryview(data)
+    while view:
+        n = os.write(fd, view)
+        view = view[n:]
+
+def _read_text_file(full_path: str) -> str:
+    """Read a file into a single bytes buffer and decode it once; large files are decoded in chunks."""
+    fd = os.open(full_path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        if size <= LARGE_FILE_SIZE:
+            return os.read(fd, size).decode("utf-8", errors="replace")
+        
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        filled = 0
+        while filled < size:
+            n = os.readv(fd, [view[filled:]])
+            if n == 0:
+                break
+            filled += n
+    finally:
+        os.close(fd)
+    
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    chunks = [decoder.decode(view[i:min(i + READ_CHUNK_SIZE, filled)]) for i in range(0, filled, READ_CHUNK_SIZE)]
+    chunks.append(decoder.decode(b"", final=True))
+    return "".join(chunks)
+
 async def get_file_content(ctx: RunContext[AgentDependencies], file_path: str) -> str:
     """Get the content of a file in the workspace."""
     agency = ctx.deps.agency
     full_path = os.path.join(agency.workspace_path, file_path)
     
     # Ensure the file is within the workspace
-    if not os.path.abspath(full_path).startswith(os.path.abspath(agency.workspace_path)):
+    if not _is_in_workspace(agency, full_path):
         return f"Error: Cannot access files outside the workspace: {file_path}"
     
     try:
         if not os.path.exists(full_path):
             return f"Error: File not found: {file_path}"
         
-        with open(full_path, 'r') as file:
-            content = file.read()
+        content = _read_text_file(full_path)
         
         return f"File content of {file_path}:\n\n{content}"
     except Exception as e:
         return f"Error reading file {file_path}: {str(e)}"
 
-async def prepare_get_file_content_tool(
-    ctx: RunContext[AgentDependencies], tool_def: ToolDefinition
-) -> Union[ToolDefinition, None]:
-    agent: 'Agent' = ctx.deps.agency.agents[ctx.deps.agent_id]
-    
-    if not agent.accessible_tools.get(tool_def.name, False):
-        print(f"Tool {tool_def.name} is not accessible.")
-        return None
-    
-    return tool_def
-
-get_file_tool = Tool(get_file_content, prepare=prepare_get_file_content_tool)
+get_file_tool = Tool(get_file_content, prepare=prepare_accessible_tool)
 
 async def make_file(ctx: RunContext[AgentDependencies], file_path: str, content: str) -> str:
     """Create a new file in the workspace with the specified content."""
@@ -629,38 +717,28 @@ async def make_file(ctx: RunContext[AgentDependencies], file_path: str, content:
     full_path = os.path.join(agency.workspace_path, file_path)
     
     # Ensure the file is within the workspace
-    if not os.path.abspath(full_path).startswith(os.path.abspath(agency.workspace_path)):
+    if not _is_in_workspace(agency, full_path):
         return f"Error: Cannot create files outside the workspace: {file_path}"
     
     try:
         # Create directory if it doesn't exist
-        directory = os.path.dirname(full_path)
-        if directory:
-            os.makedirs(directory, exist_ok=True)
-        
-        # Check if file already exists
-        if os.path.exists(full_path):
-            return f"Error: File already exists: {file_path}. Use edit_file to modify it."
+        if os.path.dirname(file_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
         
-        with open(full_path, 'w') as file:
-            file.write(content)
+        # O_EXCL fails if the file already exists
+        fd = _open_in_workspace(agency, file_path, full_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+        try:
+            _write_all(fd, content.encode("utf-8"))
+        finally:
+            os.close(fd)
         
         return f"File created successfully: {file_path}"
+    except FileExistsError:
+        return f"Error: File already exists: {file_path}. Use edit_file to modify it."
     except Exception as e:
         return f"Error creating file {file_path}: {str(e)}"
 
-async def prepare_make_file_tool(
-    ctx: RunContext[AgentDependencies], tool_def: ToolDefinition
-) -> Union[ToolDefinition, None]:
-    agent: 'Agent' = ctx.deps.agency.agents[ctx.deps.agent_id]
-    
-    if not agent.accessible_tools.get(tool_def.name, False):
-        print(f"Tool {tool_def.name} is not accessible.")
-        return None
-    
-    return tool_def
-
-make_file_tool = Tool(make_file, prepare=prepare_make_file_tool)
+make_file_tool = Tool(make_file, prepare=prepare_accessible_tool)
 
 async def edit_file(ctx: RunContext[AgentDependencies], file_path: str, content: str) -> str:
     """Edit an existing file in the workspace. Replaces the entire content."""
@@ -668,32 +746,24 @@ async def edit_file(ctx: RunContext[AgentDependencies], file_path: str, content:
     full_path = os.path.join(agency.workspace_path, file_path)
     
     # Ensure the file is within the workspace
-    if not os.path.abspath(full_path).startswith(os.path.abspath(agency.workspace_path)):
+    if not _is_in_workspace(agency, full_path):
         return f"Error: Cannot edit files outside the workspace: {file_path}"
     
     try:
-        if not os.path.exists(full_path):
-            return f"Error: File not found: {file_path}. Use make_file to create it."
-        
-        with open(full_path, 'w') as file:
-            file.write(content)
+        # Without O_CREAT this fails if the file doesn't exist
+        fd = _open_in_workspace(agency, file_path, full_path, os.O_WRONLY | os.O_TRUNC)
+        try:
+            _write_all(fd, content.encode("utf-8"))
+        finally:
+            os.close(fd)
         
         return f"File edited successfully: {file_path}"
+    except FileNotFoundError:
+        return f"Error: File not found: {file_path}. Use make_file to create it."
     except Exception as e:
         return f"Error editing file {file_path}: {str(e)}"
 
-async def prepare_edit_file_tool(
-    ctx: RunContext[AgentDependencies], tool_def: ToolDefinition
-) -> Union[ToolDefinition, None]:
-    agent: 'Agent' = ctx.deps.agency.agents[ctx.deps.agent_id]
-    
-    if not agent.accessible_tools.get(tool_def.name, False):
-        print(f"Tool {tool_def.name} is not accessible.")
-        return None
-    
-    return tool_def
-
-edit_file_tool = Tool(edit_file, prepare=prepare_edit_file_tool)
+edit_file_tool = Tool(edit_file, prepare=prepare_accessible_tool)
 
 async def delete_file(ctx: RunContext[AgentDependencies], file_path: str) -> str:
     """Delete a file from the workspace."""
@@ -701,34 +771,25 @@ async def delete_file(ctx: RunContext[AgentDependencies], file_path: str) -> str
     full_path = os.path.join(agency.workspace_path, file_path)
     
     # Ensure the file is within the workspace
-    if not os.path.abspath(full_path).startswith(os.path.abspath(agency.workspace_path)):
+    if not _is_in_workspace(agency, full_path):
         return f"Error: Cannot delete files outside the workspace: {file_path}"
     
     try:
         if not os.path.exists(full_path):
             return f"Error: File not found: {file_path}"
         
+        # Run the deletion in the default executor so large trees don't block the event loop
+        loop = asyncio.get_running_loop()
         if os.path.isdir(full_path):
-            shutil.rmtree(full_path)
+            await loop.run_in_executor(None, shutil.rmtree, full_path)
             return f"Directory deleted successfully: {file_path}"
         else:
-            os.remove(full_path)
+            await loop.run_in_executor(None, os.remove, full_path)
             return f"File deleted successfully: {file_path}"
     except Exception as e:
         return f"Error deleting file {file_path}: {str(e)}"
 
-async def prepare_delete_file_tool(
-    ctx: RunContext[AgentDependencies], tool_def: ToolDefinition
-) -> Union[ToolDefinition, None]:
-    agent: 'Agent' = ctx.deps.agency.agents[ctx.deps.agent_id]
-    
-    if not agent.accessible_tools.get(tool_def.name, False):
-        print(f"Tool {tool_def.name} is not accessible.")
-        return None
-    
-    return tool_def
-
-delete_file_tool = Tool(delete_file, prepare=prepare_delete_file_tool)
+delete_file_tool = Tool(delete_file, prepare=prepare_accessible_tool)
 
 async def list_files(ctx: RunContext[AgentDependencies], directory: str = "") -> str:
     """List all files in the specified directory within the workspace."""
@@ -736,7 +797,7 @@ async def list_files(ctx: RunContext[AgentDependencies], directory: str = "") ->
     full_path = os.path.join(agency.workspace_path, directory)
     
     # Ensure the directory is within the workspace
-    if not os.path.abspath(full_path).startswith(os.path.abspath(agency.workspace_path)):
+    if not _is_in_workspace(agency, full_path):
         return f"Error: Cannot list files outside the workspace: {directory}"
     
     try:
@@ -746,40 +807,41 @@ async def list_files(ctx: RunContext[AgentDependencies], directory: str = "") ->
         if not os.path.isdir(full_path):
             return f"Error: {directory} is not a directory"
         
+        rel_root = os.path.relpath(full_path, agency.workspace_path)
+        if rel_root == '.':
+            rel_root = ''
+        
+        # Walk breadth-first with a queue so the shallowest entries are listed first when the
+        # listing is truncated; DirEntry.is_dir() uses the cached d_type instead of a stat()
         file_list = []
-        for root, dirs, files in os.walk(full_path):
-            rel_root = os.path.relpath(root, agency.workspace_path)
-            if rel_root == '.':
-                rel_root = ''
-            
-            # Add directories with trailing slash
-            for d in dirs:
-                file_list.append(os.path.join(rel_root, d) + '/')
-            
-            # Add files
-            for f in files:
-                file_list.append(os.path.join(rel_root, f))
+        truncated = False
+        queue = deque([(rel_root, full_path)])
+        while queue and not truncated:
+            rel, abs_path = queue.popleft()
+            with os.scandir(abs_path) as it:
+                for entry in it:
+                    if len(file_list) >= LIST_FILES_MAX_ENTRIES:
+                        truncated = True
+                        break
+                    name = f"{rel}/{entry.name}" if rel else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        # Add directories with trailing slash
+                        file_list.append(name + '/')
+                        queue.append((name, entry.path))
+                    else:
+                        file_list.append(name)
         
         if not file_list:
             return f"No files found in {directory or 'workspace root'}"
         
         file_list.sort()
+        if truncated:
+            file_list.append(f"... (truncated after {LIST_FILES_MAX_ENTRIES} entries; list a subdirectory to see more)")
         return f"Files in {directory or 'workspace root'}:\n" + "\n".join(file_list)
     except Exception as e:
         return f"Error listing files in {directory}: {str(e)}"
 
-async def prepare_list_files_tool(
-    ctx: RunContext[AgentDependencies], tool_def: ToolDefinition
-) -> Union[ToolDefinition, None]:
-    agent: 'Agent' = ctx.deps.agency.agents[ctx.deps.agent_id]
-    
-    if not agent.accessible_tools.get(tool_def.name, False):
-        print(f"Tool {tool_def.name} is not accessible.")
-        return None
-    
-    return tool_def
-
-list_files_tool = Tool(list_files, prepare=prepare_list_files_tool)
+list_files_tool = Tool(list_files, prepare=prepare_accessible_tool)
 
 
 # BASH TOOL (or zsh)
@@ -788,26 +850,28 @@ list_files_tool = Tool(list_files, prepare=prepare_list_files_tool)
 # NEW_TERMINAL, RUN_COMMAND, DELETE_TERMINAL, LIST_TERMINALS
 # BASH TERMINAL TOOLS
 class TerminalProcess:
+    __slots__ = ("workspace_path", "terminal_id", "process", "active", "_cmd_seq")
+    
     def __init__(self, workspace_path: str, terminal_id: str):
         self.workspace_path = workspace_path
         self.terminal_id = terminal_id
         self.process = None
         self.active = False
+        # Sequence number for command completion markers, unique within this shell
+        self._cmd_seq = 0
     
     async def start(self):
         if self.active:
             return False
         
-        # Create a bash process that will stay alive
-        self.process = subprocess.Popen(
-            ["bash"],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+        # Create a bash process that will stay alive for every command run in this terminal;
+        # stderr is merged so errors show up in the command output
+        self.process = await asyncio.create_subprocess_exec(
+            "bash",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
             cwd=self.workspace_path,
-            text=True,
-            bufsize=1,
-            universal_newlines=True
         )
         self.active = True
         return True
@@ -817,12 +881,14 @@ class TerminalProcess:
             return False
         
         try:
-            self.process.terminate()
-            # Give it a moment to terminate gracefully
-            await asyncio.sleep(0.5)
-            if self.process.poll() is None:
-                # Force kill if it doesn't terminate
+            # Closing stdin lets bash exit on its own
+            self.process.stdin.close()
+            try:
+                await asyncio.wait_for(self.process.wait(), 0.5)
+            except asyncio.TimeoutError:
+                # Force kill if it doesn't exit
                 self.process.kill()
+                await self.process.wait()
             self.active = False
             return True
         except Exception as e:
@@ -834,39 +900,43 @@ class TerminalProcess:
             return "Error: Terminal is not active"
         
         try:
-            # Send command with newline to simulate enter key
-            self.process.stdin.write(f"{command}\n")
-            self.process.stdin.flush()
-            
-            # Add a marker to know when output is complete
-            marker = f"COMMAND_COMPLETE_{uuid.uuid4()}"
-            self.process.stdin.write(f"echo {marker}\n")
-            self.process.stdin.flush()
+            # Send command with newline to simulate enter key, followed by a marker on its
+            # own line to know when output is complete
+            self._cmd_seq += 1
+            marker = f"COMMAND_COMPLETE_{self.terminal_id}_{self._cmd_seq}".encode()
+            self.process.stdin.write(command.encode() + b"\nprintf '\\n%s\\n' " + marker + b"\n")
+            await self.process.stdin.drain()
             
-            # Collect output until the marker is found
-            output_lines = []
-            while True:
-                line = self.process.stdout.readline()
-                if marker in line:
+            # Collect output in chunks until the marker line is found, only scanning the bytes
+            # that could contain a marker that wasn't complete last time
+            sentinel = b"\n" + marker + b"\n"
+            output = bytearray()
+            end = -1
+            while end == -1:
+                chunk = await self.process.stdout.read(4096)
+                if not chunk:
+                    # Shell exited before printing the marker
+                    end = len(output)
                     break
-                output_lines.append(line)
+                start = max(0, len(output) - len(sentinel) + 1)
+                output += chunk
+                end = output.find(sentinel, start)
             
-            # Remove the command from the output
-            if output_lines and command in output_lines[0]:
-                output_lines.pop(0)
-            
-            return "".join(output_lines)
+            # The newline printed ahead of the marker is part of the sentinel, so it's dropped too
+            return output[:end].decode("utf-8", errors="replace")
         except Exception as e:
             return f"Error executing command: {str(e)}"
 
 class TerminalManager:
+    __slots__ = ("workspace_path", "terminals")
+    
     def __init__(self, workspace_path: str):
         self.workspace_path = workspace_path
         self.terminals: Dict[str, TerminalProcess] = {}
     
     async def create_terminal(self, terminal_id: Optional[str] = None) -> str:
         if terminal_id is None:
-            terminal_id = f"terminal_{uuid.uuid4().hex[:8]}"
+            terminal_id = f"terminal_{secrets.token_hex(4)}"
         
         if terminal_id in self.terminals:
             return f"Terminal with ID {terminal_id} already exists"
@@ -881,10 +951,11 @@ class TerminalManager:
             return f"Failed to create terminal with ID: {terminal_id}"
     
     async def delete_terminal(self, terminal_id: str) -> str:
-        if terminal_id not in self.terminals:
+        terminal = self.terminals.get(terminal_id)
+        if terminal is None:
             return f"Terminal with ID {terminal_id} does not exist"
         
-        success = await self.terminals[terminal_id].stop()
+        success = await terminal.stop()
         if success:
             del self.terminals[terminal_id]
             return f"Terminal {terminal_id} deleted successfully"
@@ -892,10 +963,11 @@ class TerminalManager:
             return f"Failed to delete terminal {terminal_id}"
     
     async def run_command(self, terminal_id: str, command: str) -> str:
-        if terminal_id not in self.terminals:
+        terminal = self.terminals.get(terminal_id)
+        if terminal is None:
             return f"Terminal with ID {terminal_id} does not exist"
         
-        return await self.terminals[terminal_id].run_command(command)
+        return await terminal.run_command(command)
     
     async def list_terminals(self) -> str:
         if not self.terminals:
@@ -906,8 +978,10 @@ class TerminalManager:
     
     async def shutdown_all(self):
         """Shut down all terminal processes."""
-        for terminal_id, terminal in list(self.terminals.items()):
-            await terminal.stop()
+        await asyncio.gather(
+            *(terminal.stop() for terminal in list(self.terminals.values())),
+            return_exceptions=True,
+        )
         self.terminals.clear()
 
 # Terminal tool functions
@@ -916,77 +990,34 @@ async def new_terminal(ctx: RunContext[AgentDependencies], terminal_id: Optional
     agency = ctx.deps.agency
     return await agency.terminal_manager.create_terminal(terminal_id)
 
-async def prepare_new_terminal_tool(
-    ctx: RunContext[AgentDependencies], tool_def: ToolDefinition
-) -> Union[ToolDefinition, None]:
-    agent: 'Agent' = ctx.deps.agency.agents[ctx.deps.agent_id]
-    
-    if not agent.accessible_tools.get(tool_def.name, False):
-        print(f"Tool {tool_def.name} is not accessible.")
-        return None
-    
-    return tool_def
-
-new_terminal_tool = Tool(new_terminal, prepare=prepare_new_terminal_tool)
+new_terminal_tool = Tool(new_terminal, prepare=prepare_accessible_tool)
 
 async def run_command(ctx: RunContext[AgentDependencies], terminal_id: str, command: str) -> str:
     """Run a bash command in the specified terminal."""
     agency = ctx.deps.agency
     return await agency.terminal_manager.run_command(terminal_id, command)
 
-async def prepare_run_command_tool(
-    ctx: RunContext[AgentDependencies], tool_def: ToolDefinition
-) -> Union[ToolDefinition, None]:
-    agent: 'Agent' = ctx.deps.agency.agents[ctx.deps.agent_id]
-    
-    if not agent.accessible_tools.get(tool_def.name, False):
-        print(f"Tool {tool_def.name} is not accessible.")
-        return None
-    
-    return tool_def
-
-run_command_tool = Tool(run_command, prepare=prepare_run_command_tool)
+run_command_tool = Tool(run_command, prepare=prepare_accessible_tool)
 
 async def delete_terminal(ctx: RunContext[AgentDependencies], terminal_id: str) -> str:
     """Delete a terminal from the workspace."""
     agency = ctx.deps.agency
     return await agency.terminal_manager.delete_terminal(terminal_id)
 
-async def prepare_delete_terminal_tool(
-    ctx: RunContext[AgentDependencies], tool_def: ToolDefinition
-) -> Union[ToolDefinition, None]:
-    agent: 'Agent' = ctx.deps.agency.agents[ctx.deps.agent_id]
-    
-    if not agent.accessible_tools.get(tool_def.name, False):
-        print(f"Tool {tool_def.name} is not accessible.")
-        return None
-    
-    return tool_def
-
-delete_terminal_tool = Tool(delete_terminal, prepare=prepare_delete_terminal_tool)
+delete_terminal_tool = Tool(delete_terminal, prepare=prepare_accessible_tool)
 
 async def list_terminals(ctx: RunContext[AgentDependencies]) -> str:
     """List all active terminals in the workspace."""
     agency = ctx.deps.agency
     return await agency.terminal_manager.list_terminals()
 
-async def prepare_list_terminals_tool(
-    ctx: RunContext[AgentDependencies], tool_def: ToolDefinition
-) -> Union[ToolDefinition, None]:
-    agent: 'Agent' = ctx.deps.agency.agents[ctx.deps.agent_id]
-    
-    if not agent.accessible_tools.get(tool_def.name, False):
-        print(f"Tool {tool_def.name} is not accessible.")
-        return None
-    
-    return tool_def
-
-list_terminals_tool = Tool(list_terminals, prepare=prepare_list_terminals_tool)
+list_terminals_tool = Tool(list_terminals, prepare=prepare_accessible_tool)
 
 
 all_tools = [
     create_new_agent_tool,
     send_message_tool,
+    send_messages_tool,
     call_meeting_tool,
     internal_monologue_tool,
     get_file_tool,
@@ -1010,12 +1041,21 @@ class AgentState(BaseModel):
     system_prompt: str
     provider: str
     tool_names: List[str] = Field(default_factory=list)
-    accessible_tools: Dict[str, bool] = Field(default_factory=dict)
+    # Names of the enabled tools only
+    accessible_tools: List[str] = Field(default_factory=list)
     message_history: List[ModelMessage] = Field(default_factory=list)
     parent_id: Optional[str] = None
     child_ids: List[str] = Field(default_factory=list)
     mcp_server_ids: List[str] = Field(default_factory=list)
 
+    @field_validator("accessible_tools", mode="before")
+    @classmethod
+    def _accessible_tools_from_dict(cls, value: Any) -> Any:
+        # Older saves stored a {name: enabled} mapping
+        if isinstance(value, dict):
+            return [name for name, enabled in value.items() if enabled]
+        return value
+
 class Agent:
     def __init__(self,
                  agency: 'Agency',
@@ -1034,28 +1074,27 @@ class Agent:
         self.tools = tools
         self.system_prompt = system_prompt
         self.message_history: List[ModelMessage] = []
+        # Messages shared with another agent that are sent before message_history, e.g. a meeting host's history
+        self._history_prefix: List[ModelMessage] = []
+        # Whether history changes are recorded in the agency's event log
+        self._log_history = True
         self.accessible_tools = accessible_tools
-        self.mcp_server_ids = mcp_servers
+        # Copied so add/remove_mcp_server don't mutate a list shared with other agents
+        self.mcp_server_ids = list(mcp_servers)
         
         # Initialize agent with MCP servers if any
-        mcp_servers_list = []
-        for server_id in self.mcp_server_ids:
-            server = self.agency.server_manager.get_server(server_id)
-            if server:
-                mcp_servers_list.append(server)
-        
         self.agent: PydanticAgent = PydanticAgent(
-            provider,
+            agency.get_model(provider),
             system_prompt=system_prompt,
             tools=tools,
-            mcp_servers=mcp_servers_list  # always a list, even if empty
+            mcp_servers=self._resolve_mcp_servers()  # always a list, even if empty
         )
         
         self.parent_id = None
         self.children = {}
         
-        self.curr_depth = lambda: 0 if self.parent_id is None else self.agency.agents[self.parent_id].curr_depth() + 1
-        self.curr_breadth = lambda: len(self.children)
+        # Distance from the root, kept up to date when parents are assigned instead of walking parent links per check
+        self.depth = 0
         
         # Add System Prompt
         self.message_history.append(
@@ -1068,9 +1107,63 @@ class Agent:
             )
         )
         
+    @property
+    def accessible_tools(self) -> Dict[str, bool]:
+        return self._accessible_tools
+
+    @accessible_tools.setter
+    def accessible_tools(self, accessible_tools: Dict[str, bool]) -> None:
+        # Prepare functions run on every LLM turn, so resolve the enabled names once per assignment
+        self._accessible_tools = accessible_tools
+        self.accessible_tool_names = frozenset(name for name, enabled in accessible_tools.items() if enabled)
+        self.agency.mark_state_dirty()
+        
+    @property
+    def breadth(self) -> int:
+        return len(self.children)
+    
+    def add_child(self, child: 'Agent') -> None:
+        """Make child a direct child of this agent."""
+        child.parent_id = self.id
+        self.children[child.id] = child
+        child.depth = self.depth + 1
+        child.update_subtree_depths()
+    
+    def update_subtree_depths(self) -> None:
+        """Recompute the depths of all descendants from this agent's depth."""
+        queue = deque([self])
+        while queue:
+            agent = queue.popleft()
+            for child in agent.children.values():
+                child.depth = agent.depth + 1
+                queue.append(child)
+    
     async def update_system_prompt(self, new_prompt: str) -> None:
         self.system_prompt = new_prompt
-        self.message_history[0].parts[0].content = new_prompt
+        with self.agency.history_lock:
+            self.message_history[0].parts[0].content = new_prompt
+            if self._log_history:
+                self.agency.append_system_prompt_event(self.id, new_prompt)
+        self.agency.mark_state_dirty()
+    
+    def _resolve_mcp_servers(self) -> List[MCPServerBase]:
+        """Look up this agent's MCP server ids, skipping any the manager doesn't know."""
+        servers = self.agency.server_manager.servers
+        return [servers[server_id] for server_id in self.mcp_server_ids if server_id in servers]
+    
+    def _set_mcp_servers(self, mcp_servers_list: List[MCPServerBase]) -> None:
+        """Point the PydanticAgent at a new set of MCP servers without rebuilding it."""
+        self.agency.mark_state_dirty()
+        if hasattr(self.agent, "_mcp_servers"):
+            self.agent._mcp_servers = mcp_servers_list
+        else:
+            # Fall back to a rebuild if this pydantic-ai version stores servers elsewhere
+            self.agent = PydanticAgent(
+                self.agency.get_model(self.provider),
+                system_prompt=self.system_prompt,
+                tools=self.tools,
+                mcp_servers=mcp_servers_list
+            )
     
     async def add_mcp_server(self, server_id: str) -> bool:
         """Add an MCP server to this agent and update the PydanticAgent."""
@@ -1084,19 +1177,8 @@ class Agent:
         if not server:
             return False
         
-        # Recreate the PydanticAgent with updated MCP servers
-        mcp_servers_list = []
-        for sid in self.mcp_server_ids:
-            s = self.agency.server_manager.get_server(sid)
-            if s:
-                mcp_servers_list.append(s)
-        
-        self.agent = PydanticAgent(
-            self.provider,
-            system_prompt=self.system_prompt,
-            tools=self.tools,
-            mcp_servers=mcp_servers_list if mcp_servers_list else None
-        )
+        # Update the PydanticAgent with the new MCP servers
+        self._set_mcp_servers(self._resolve_mcp_servers())
         
         return True
     
@@ -1107,32 +1189,24 @@ class Agent:
         
         self.mcp_server_ids.remove(server_id)
         
-        # Recreate the PydanticAgent with updated MCP servers
-        mcp_servers_list = []
-        for sid in self.mcp_server_ids:
-            s = self.agency.server_manager.get_server(sid)
-            if s:
-                mcp_servers_list.append(s)
-        
-        self.agent = PydanticAgent(
-            self.provider,
-            system_prompt=self.system_prompt,
-            tools=self.tools,
-            mcp_servers=mcp_servers_list if mcp_servers_list else None
-        )
+        # Update the PydanticAgent with the new MCP servers
+        self._set_mcp_servers(self._resolve_mcp_servers())
         
         return True
         
     async def run(self, prompt: str) -> AgentRunResult:
-        # Ensure all MCP servers associated with this agent are running
-        for server_id in self.mcp_server_ids:
-            if not self.agency.server_manager.is_running(server_id):
-                print(f"Starting MCP server {server_id} for agent {self.id}")
-                success = await self.agency.server_manager.start_server(server_id)
-                if not success:
-                    print(f"Warning: Failed to start MCP server {server_id}")
-    
-        existing_history = self.message_history.copy()
+        # Ensure all MCP servers associated with this agent are running, starting them concurrently
+        to_start = [server_id for server_id in self.mcp_server_ids if not self.agency.server_manager.is_running(server_id)]
+        for server_id in to_start:
+            print(f"Starting MCP server {server_id} for agent {self.id}")
+        results = await asyncio.gather(*(self.agency.server_manager.start_server(server_id) for server_id in to_start))
+        for server_id, success in zip(to_start, results):
+            if not success:
+                print(f"Warning: Failed to start MCP server {server_id}")
+    
+        # pydantic-ai copies message_history into its own run state, so the list is passed
+        # without a defensive copy; only a shared prefix needs joining
+        existing_history = self._history_prefix + self.message_history if self._history_prefix else self.message_history
         deps = AgentDependencies(agency=self.agency, agent_id=self.id)
         result = await self.agent.run(prompt, deps=deps, message_history=existing_history)
         
@@ -1141,10 +1215,19 @@ class Agent:
         return result
     
     def save_message_history(self, prompt: str, result: AgentRunResult) -> None:
-        self.message_history.extend(result.new_messages())
+        self.append_messages(result.new_messages())
         return
     
-    def save_state(self) -> AgentState:
+    def append_messages(self, messages: List[ModelMessage]) -> None:
+        """Add messages to this agent's history, recording them in the agency's event log."""
+        # Under the agency's history lock, so a concurrent save sees the messages and their event together
+        with self.agency.history_lock:
+            self.message_history.extend(messages)
+            if self._log_history:
+                self.agency.append_history_event(self.id, messages)
+        self.agency.mark_state_dirty()
+    
+    def save_state(self, include_history: bool = True) -> AgentState:
         """Creates a Pydantic model representing the agent's state."""
         return AgentState(
             id=self.id,
@@ -1152,8 +1235,8 @@ class Agent:
             system_prompt=self.system_prompt,
             provider=self.provider,
             tool_names=[tool.name for tool in self.tools],
-            accessible_tools=self.accessible_tools,
-            message_history=self.message_history,
+            accessible_tools=sorted(self.accessible_tool_names),
+            message_history=self.message_history if include_history else [],
             parent_id=self.parent_id,
             child_ids=list(self.children.keys()),
             mcp_server_ids=self.mcp_server_ids
@@ -1171,7 +1254,7 @@ class Agent:
             provider=state.provider,
             system_prompt=state.system_prompt,
             tools=agent_tools,
-            accessible_tools=state.accessible_tools,
+            accessible_tools=dict.fromkeys(state.accessible_tools, True),
             mcp_servers=state.mcp_server_ids
         )
         agent.message_history = state.message_history
@@ -1188,18 +1271,46 @@ class AgencyState(BaseModel):
     max_breadth: int = 3
     max_agents: int = 10
     workspace_id: Optional[str] = None
+    # Set on incremental saves and on an agency's base state: agent histories are rebuilt from
+    # base_snapshot (another state file) plus the first event_log_size bytes of event_log, or
+    # all of it when event_log_size is None
+    base_snapshot: Optional[str] = None
+    event_log: Optional[str] = None
+    event_log_size: Optional[int] = None
     
+AGENT_STATE_LIST_ADAPTER = TypeAdapter(List[AgentState])
+
+def _write_bytes(path: str, data: bytes, mode: str = "wb") -> None:
+    with open(path, mode) as file:
+        file.write(data)
+
+def _remove_files(*paths: str) -> None:
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
 class Agency:
+    # Suffix of incremental save files
+    DELTA_SUFFIX = ".delta.json"
+
     def __init__(self, state: Optional[AgencyState] = None, tools: List[Tool] = all_tools, workspace_id: Optional[str] = None,
                  main_agent_system_prompt: str = "You are a helpful assistant."
                  ):
         self.agents: Dict[str, Agent] = {}
+        # Serialized snapshots for the polling API endpoints, rebuilt only after a mutation
+        self._state_dirty = True
+        self._state_cache: Dict[str, bytes] = {}
         self.all_tools_map = {tool.name: tool for tool in tools}
         self.server_manager = MCPServerManager()
+        # Upper bound on concurrent LLM calls, e.g. meeting participants speaking in the same round
+        self.max_parallel_llm = int(os.environ.get("MAX_PARALLEL_LLM", 4))
+        # Resolved models by provider string, so agents on the same provider share one client
+        # (and its connection pool) instead of each building their own
+        self._models: Dict[str, Model] = {}
         
         # Setup workspace
         self.workspace_base_path = Path("./workspaces").resolve()
-        os.makedirs(self.workspace_base_path, exist_ok=True)
+        ensure_dir(self.workspace_base_path)
         
         # Create or use provided workspace ID
         if state and state.workspace_id:
@@ -1207,12 +1318,34 @@ class Agency:
         elif workspace_id:
             self.workspace_id = workspace_id
         else:
-            self.workspace_id = f"workspace_{uuid.uuid4().hex[:8]}"
+            self.workspace_id = f"workspace_{secrets.token_hex(4)}"
         
         self.workspace_path = os.path.join(self.workspace_base_path, self.workspace_id)
-        os.makedirs(self.workspace_path, exist_ok=True)
+        ensure_dir(self.workspace_path)
+        # Resolved once so file tools can sandbox-check paths without re-resolving the workspace
+        self.workspace_abspath = os.path.realpath(self.workspace_path)
+        # Kept open so file tools can open paths relative to it (where the platform supports dir_fd)
+        self.workspace_fd: Optional[int] = None
+        if os.open in os.supports_dir_fd:
+            self.workspace_fd = os.open(self.workspace_path, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
         print(f"Using workspace: {self.workspace_path}")
         
+        # History changes are appended to an event log kept next to (not inside) the workspace, so
+        # agents' file tools can't see it. Each agency instance has its own log and a base state
+        # file naming it, written as soon as the agency exists, so the log can always be replayed.
+        # One worker thread does the writes, keeping them in order and off the event loop
+        self.history_lock = threading.RLock()
+        self._event_log_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-log")
+        self._event_log_closed = False
+        self.base_snapshot_path = ""
+        self.event_log_path = ""
+        self._event_log_size = 0
+        self._events_since_base = 0
+        # Whether an incremental save names the current base and log, so they must be kept
+        self._base_referenced = False
+        # save_to_file writes the full state instead of an incremental save after this many events
+        self.compact_every = int(os.environ.get("EVENT_LOG_COMPACT_EVERY", 200))
+        
         # Initialize terminal manager
         self.terminal_manager = TerminalManager(self.workspace_path)
 
@@ -1246,6 +1379,12 @@ class Agency:
                     else:
                         print(f"Warning: Child agent ID {child_id} not found for parent {agent.id}")
 
+            # 3. Fill in depths from the roots down
+            for agent in self.agents.values():
+                if agent.parent_id not in self.agents:
+                    agent.depth = 0
+                    agent.update_subtree_depths()
+
         else:
             # Initialize fresh agency with default configuration
             # self.default_provider = "anthropic:claude-3-5-haiku-latest"
@@ -1267,6 +1406,7 @@ class Agency:
                 accessible_tools={
                     "create_new_agent": True,
                     "message_agent": True,
+                    "message_agents": True,
                     "call_meeting": True,
                     "internal_monologue": True,
                     "get_file_content": True,
@@ -1288,6 +1428,8 @@ class Agency:
             self.max_depth = 3
             self.max_breadth = 7
             self.max_agents = 10
+        
+        self._start_event_log(self.save_state())
     
     def _setup_mcp_servers(self):
         """Initialize default MCP servers for the agency."""
@@ -1319,17 +1461,15 @@ class Agency:
         return f"Created MCP server with ID: {server_id}"
         
     async def run(self, prompt: str) -> AgentRunResult:
-        # Start any MCP servers needed by the main agent
-        for server_id in self.main_agent.mcp_server_ids:
-            if not self.server_manager.is_running(server_id):
-                print(f"Starting MCP server {server_id} for main agent")
-                success = await self.server_manager.start_server(server_id)
-                if not success:
-                    print(f"Warning: Failed to start MCP server {server_id}")
-                # Wait for the server to be ready (robust readiness check)
-                ready = await self.server_manager.wait_for_server_ready(server_id, timeout=120, interval=2)
-                if not ready:
-                    raise RuntimeError(f"MCP server {server_id} did not become ready in time. Please check logs and try again.")
+        # Start any MCP servers needed by the main agent concurrently;
+        # start_server returns once each server is ready
+        to_start = [server_id for server_id in self.main_agent.mcp_server_ids if not self.server_manager.is_running(server_id)]
+        for server_id in to_start:
+            print(f"Starting MCP server {server_id} for main agent")
+        results = await asyncio.gather(*(self.server_manager.start_server(server_id, timeout=120) for server_id in to_start))
+        for server_id, ready in zip(to_start, results):
+            if not ready:
+                raise RuntimeError(f"MCP server {server_id} did not become ready in time. Please check logs and try again.")
                 
         result = await self.main_agent.run(prompt)
         return result
@@ -1338,6 +1478,22 @@ class Agency:
         """Properly shut down all MCP servers and terminal processes."""
         await self.server_manager.stop_all_servers()
         await self.terminal_manager.shutdown_all()
+        with self.history_lock:
+            # The base state and log are only needed by incremental saves that name them
+            if not self._base_referenced and not self._event_log_closed:
+                self._event_log_writer.submit(_remove_files, self.base_snapshot_path, self.event_log_path)
+            self._event_log_closed = True
+        await asyncio.to_thread(self._event_log_writer.shutdown)
+        if self.workspace_fd is not None:
+            os.close(self.workspace_fd)
+            self.workspace_fd = None
+    
+    def get_model(self, provider: str) -> Model:
+        """Return the shared model for a provider string like "openai:gpt-4o"."""
+        model = self._models.get(provider)
+        if model is None:
+            model = self._models[provider] = infer_model(provider)
+        return model
     
     def next_id(self) -> str:
         agent_id = str(self.current_id)
@@ -1347,11 +1503,78 @@ class Agency:
     def __str__(self) -> str:
         return f"Agency with {len(self.agents)} agents and {len(self.server_manager.servers)} MCP servers."
     
-    def save_state(self) -> AgencyState:
+    def _start_event_log(self, base_state: AgencyState, base_snapshot: Optional[str] = None) -> None:
+        """Start a new event log, writing base_state as the state it continues from.
+        
+        The previous base and log are removed unless an incremental save names them.
+        """
+        log_id = secrets.token_hex(8)
+        base_path = os.path.join(self.workspace_base_path, f"{self.workspace_id}.{log_id}.base.json")
+        log_path = os.path.join(self.workspace_base_path, f"{self.workspace_id}.{log_id}.events.jsonl")
+        base_state.base_snapshot = base_snapshot
+        base_state.event_log = log_path
+        data = AgencyState.__pydantic_serializer__.to_json(base_state)
+        with self.history_lock:
+            if self.base_snapshot_path and not self._base_referenced:
+                self._event_log_writer.submit(_remove_files, self.base_snapshot_path, self.event_log_path)
+            self._event_log_writer.submit(_write_bytes, base_path, data)
+            self.base_snapshot_path = base_path
+            self.event_log_path = log_path
+            self._event_log_size = 0
+            self._events_since_base = 0
+            self._base_referenced = False
+
+    def _append_event(self, line: bytes) -> None:
+        with self.history_lock:
+            if self._event_log_closed:
+                return
+            self._event_log_writer.submit(_write_bytes, self.event_log_path, line, "ab")
+            self._event_log_size += len(line)
+            self._events_since_base += 1
+
+    def _flush_event_log(self) -> None:
+        """Block until every queued event log write has reached its file."""
+        self._event_log_writer.submit(lambda: None).result()
+
+    def append_history_event(self, agent_id: str, messages: List[ModelMessage]) -> None:
+        """Append an agent's new messages to the event log as one JSON line."""
+        self._append_event(b"".join((
+            b'{"agent_id":', json.dumps(agent_id).encode(),
+            b',"messages":', ModelMessagesTypeAdapter.dump_json(messages),
+            b'}\n',
+        )))
+
+    def append_system_prompt_event(self, agent_id: str, system_prompt: str) -> None:
+        """Append an agent's system prompt change to the event log."""
+        self._append_event(json.dumps({"agent_id": agent_id, "system_prompt": system_prompt}).encode() + b"\n")
+
+    def mark_state_dirty(self) -> None:
+        """Invalidate the cached state snapshots after agents or their histories change."""
+        self._state_dirty = True
+
+    def _cached_snapshots(self) -> Dict[str, bytes]:
+        if self._state_dirty or not self._state_cache:
+            agency_state = self.save_state()
+            self._state_cache = {
+                "agency": AgencyState.__pydantic_serializer__.to_json(agency_state),
+                "agents": AGENT_STATE_LIST_ADAPTER.dump_json(agency_state.agents),
+            }
+            self._state_dirty = False
+        return self._state_cache
+
+    def state_json(self) -> bytes:
+        """The agency state as JSON, served from cache until the next mutation."""
+        return self._cached_snapshots()["agency"]
+
+    def agents_state_json(self) -> bytes:
+        """Every agent's state as a JSON list, served from cache until the next mutation."""
+        return self._cached_snapshots()["agents"]
+
+    def save_state(self, include_history: bool = True) -> AgencyState:
         """Creates a Pydantic model representing the agency's state."""
         return AgencyState(
             agency_id=self.main_agent.id,
-            agents=[agent.save_state() for agent in self.agents.values()],
+            agents=[agent.save_state(include_history) for agent in self.agents.values()],
             current_id=self.current_id,
             max_depth=self.max_depth,
             max_breadth=self.max_breadth,
@@ -1359,39 +1582,117 @@ class Agency:
             workspace_id=self.workspace_id,
         )
 
-    def save_to_file(self, directory: str, use_json=True) -> None:
-        """Saves the agency state to a file (JSON or YAML)."""
-        agency_state = self.save_state()
-        file_id = str(uuid.uuid4())
+    def save_to_file(self, directory: str, use_json=True, compact: bool = False) -> str:
+        """Saves the agency state to a file (JSON or YAML) and returns its path.
+        
+        Saves are incremental: the file holds the agents without their message histories,
+        plus the base state and event log offset the histories are rebuilt from. When compact
+        is set, or compact_every events have been logged since the base, the full state is
+        written instead and becomes the base of a new event log.
+        """
+        ensure_dir(directory)
+        file_id = secrets.token_hex(16)
         extension = "json" if use_json else "yaml"
-        file_path = os.path.join(directory, f"{file_id}.{extension}")
+        with self.history_lock:
+            compact = compact or self._events_since_base >= self.compact_every
+            if compact:
+                file_path = os.path.join(directory, f"{file_id}.{extension}")
+                agency_state = self.save_state()
+                # Events from here on go to a new log whose base only points at this file
+                self._start_event_log(self.save_state(include_history=False), base_snapshot=os.path.abspath(file_path))
+            else:
+                # Incremental saves are always JSON; they are small and only read back by read_state_file
+                file_path = os.path.join(directory, f"{file_id}{self.DELTA_SUFFIX}")
+                agency_state = self.save_state(include_history=False)
+                agency_state.base_snapshot = self.base_snapshot_path
+                agency_state.event_log = self.event_log_path
+                agency_state.event_log_size = self._event_log_size
+                self._base_referenced = True
         print(f"Saving agency state to {file_path}")
 
-        os.makedirs(directory, exist_ok=True)
+        if not compact:
+            # The offset above counts queued writes, so let them land first
+            self._flush_event_log()
+            _write_bytes(file_path, AgencyState.__pydantic_serializer__.to_json(agency_state, indent=2))
+        elif use_json:
+            # Serialize straight to bytes in pydantic-core, skipping the intermediate str
+            _write_bytes(file_path, AgencyState.__pydantic_serializer__.to_json(agency_state, indent=2))
+        else:
+            import yaml
+            # Prefer the libyaml-backed dumper when PyYAML was built with it
+            dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+            with open(file_path, "w") as file:
+                yaml.dump(agency_state.model_dump(mode='python'), file, Dumper=dumper, indent=2)
+        return file_path
+
+    @staticmethod
+    def _parse_state_file(file_path: str) -> AgencyState:
+        _, extension = os.path.splitext(file_path)
+        use_json = extension.lower() == ".json"
 
-        with open(file_path, "w") as file:
-            if use_json:
-                file.write(agency_state.model_dump_json(indent=2))
-            else:
-                import yaml
-                yaml.dump(agency_state.model_dump(mode='python'), file, indent=2)
+        if use_json:
+            # pydantic-core parses and validates the raw bytes in one pass
+            with open(file_path, "rb") as file:
+                return AgencyState.model_validate_json(file.read())
+        else:
+            import yaml
+            # Prefer the libyaml-backed loader when PyYAML was built with it
+            loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+            with open(file_path, "r") as file:
+                data = yaml.load(file, Loader=loader)
+            return AgencyState.model_validate(data)
+
+    @classmethod
+    def _rebuild_histories(cls, state: AgencyState, replay_log: bool = True) -> AgencyState:
+        """Fill in agent histories from the base state and event log that the state names."""
+        if state.base_snapshot:
+            base = cls._rebuild_histories(cls._parse_state_file(state.base_snapshot), replay_log=False)
+            base_histories = {agent.id: agent.message_history for agent in base.agents}
+            for agent in state.agents:
+                # Agents created after the base start from just their system prompt
+                agent.message_history = base_histories.get(agent.id) or [
+                    ModelRequest(parts=[SystemPromptPart(content=agent.system_prompt)])
+                ]
+        if replay_log and state.event_log and os.path.exists(state.event_log):
+            agents = {agent.id: agent for agent in state.agents}
+            with open(state.event_log, "rb") as file:
+                events = file.read() if state.event_log_size is None else file.read(state.event_log_size)
+            for line in events.splitlines():
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # A write cut short by a crash
+                    break
+                agent = agents.get(event["agent_id"])
+                # A base state doesn't know agents created after it was written
+                if agent is None:
+                    continue
+                if "system_prompt" in event:
+                    agent.system_prompt = event["system_prompt"]
+                    agent.message_history[0].parts[0].content = event["system_prompt"]
+                else:
+                    agent.message_history.extend(ModelMessagesTypeAdapter.validate_python(event["messages"]))
+        state.base_snapshot = state.event_log = state.event_log_size = None
+        return state
 
     @classmethod
-    def load_from_file(cls, file_path: str, tools: List[Tool] = all_tools) -> 'Agency':
-        """Loads agency state from a file."""
+    def read_state_file(cls, file_path: str) -> AgencyState:
+        """Reads and validates an agency state file (JSON or YAML), including incremental saves."""
         print(f"Loading agency state from {file_path}")
-        _, extension = os.path.splitext(file_path)
-        use_json = extension.lower() == ".json"
+        return cls._rebuild_histories(cls._parse_state_file(file_path))
 
-        with open(file_path, "r") as file:
-            if use_json:
-                agency_state = AgencyState.model_validate_json(file.read())
-            else:
-                import yaml
-                data = yaml.safe_load(file)
-                agency_state = AgencyState.model_validate(data)
+    @classmethod
+    async def load_from_file(cls, file_path: str, tools: List[Tool] = all_tools) -> 'Agency':
+        """Loads agency state from a file.
+        
+        Parsing the file and rebuilding every agent is blocking, CPU-bound work, so it runs
+        in the default executor to keep the event loop serving other requests.
+        """
+        def load() -> 'Agency':
+            # The loaded agency starts its own base and log, leaving the file's as they were
+            return cls(state=cls.read_state_file(file_path), tools=tools)
 
-        return cls(state=agency_state, tools=tools)
+        return await asyncio.get_running_loop().run_in_executor(None, load)
 
 # Usage
 async def main():
@@ -1416,7 +1717,7 @@ async def main():
         print(response.data)
         
         # Save the agency state
-        agency.save_to_file(SAVE_DIR)
+        agency.save_to_file(SAVE_DIR, compact=True)
     finally:
         # Ensure proper shutdown of MCP servers and terminals
         await agency.shutdown()
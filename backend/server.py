@@ -1,19 +1,25 @@
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from pydantic import BaseModel
 from typing import Optional, List
+import asyncio
+import functools
 import os
+import secrets
+import time
 
 from backend.agency import (
-    Agency, Agent, remove_agent_helper, message_agent_helper, create_new_agent_helper,
-    all_tools
+    Agency, AgencyState, Agent, remove_agent_helper, message_agent_helper, create_new_agent_helper,
+    all_tools, ensure_dir
 )
 
 SAVE_DIR = "conversations"
-os.makedirs(SAVE_DIR, exist_ok=True)
+ensure_dir(SAVE_DIR)
 
-app = FastAPI()
+# orjson serializes the dict responses in C; state endpoints already return pre-encoded bytes
+app = FastAPI(default_response_class=ORJSONResponse)
 
 
 
@@ -55,7 +61,7 @@ class StartAgencyRequest(BaseModel):
 @app.get("/agency/state")
 async def get_agency_state(request: Request):
     agency = request.app.state.agency
-    return agency.save_state().model_dump()
+    return Response(content=agency.state_json(), media_type="application/json")
 
 @app.get("/agent/{agent_id}/state")
 async def get_agent_state(agent_id: str, request: Request):
@@ -68,7 +74,7 @@ async def get_agent_state(agent_id: str, request: Request):
 @app.get("/agents")
 async def list_agents(request: Request):
     agency = request.app.state.agency
-    return [agent.save_state().model_dump() for agent in agency.agents.values()]
+    return Response(content=agency.agents_state_json(), media_type="application/json")
 
 @app.post("/agent/create")
 async def create_agent(req: CreateAgentRequest, request: Request):
@@ -87,8 +93,8 @@ async def create_agent(req: CreateAgentRequest, request: Request):
     )
     agency.agents[new_agent_id] = new_agent
     if parent_id in agency.agents:
-        new_agent.parent_id = parent_id
-        agency.agents[parent_id].children[new_agent_id] = new_agent
+        agency.agents[parent_id].add_child(new_agent)
+    agency.mark_state_dirty()
     return {"agent_id": new_agent_id}
 
 @app.post("/agent/{agent_id}/message")
@@ -113,14 +119,16 @@ async def remove_agent(agent_id: str, request: Request):
 
 # --- Agency State Management Endpoints ---
 
+@functools.lru_cache(maxsize=1)
+def _list_state_files(time_bucket: int) -> List[str]:
+    """Scan SAVE_DIR for state files; time_bucket makes the cached result expire every second."""
+    with os.scandir(SAVE_DIR) as entries:
+        return [entry.name for entry in entries if entry.name.endswith((".json", ".yaml", ".yml"))]
+
 @app.get("/agency/states")
 def list_agency_states():
     """List all saved agency state files."""
-    files = [
-        f for f in os.listdir(SAVE_DIR)
-        if f.endswith(".json") or f.endswith(".yaml") or f.endswith(".yml")
-    ]
-    return {"states": files}
+    return {"states": _list_state_files(int(time.time()))}
 
 @app.get("/agency/state/{state_file}")
 def get_agency_state_file(state_file: str):
@@ -128,13 +136,18 @@ def get_agency_state_file(state_file: str):
     file_path = os.path.join(SAVE_DIR, state_file)
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="State file not found")
+    if state_file.endswith(Agency.DELTA_SUFFIX):
+        # Incremental saves leave out message histories; rebuild them from the base state and event log
+        state = Agency.read_state_file(file_path)
+        return Response(content=AgencyState.__pydantic_serializer__.to_json(state), media_type="application/json")
+    if state_file.endswith(".json"):
+        # The file is already JSON; send its bytes as-is instead of parsing and re-serializing
+        with open(file_path, "rb") as f:
+            return Response(content=f.read(), media_type="application/json")
     with open(file_path, "r") as f:
-        if state_file.endswith(".json"):
-            import json
-            return json.load(f)
-        else:
-            import yaml
-            return yaml.safe_load(f)
+        import yaml
+        # Prefer the libyaml-backed loader when PyYAML was built with it
+        return yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
 
 @app.post("/agency/start")
 async def start_new_agency(req: StartAgencyRequest):
@@ -147,10 +160,10 @@ async def start_new_agency(req: StartAgencyRequest):
         file_path = os.path.join(SAVE_DIR, req.from_state_file)
         if not os.path.exists(file_path):
             raise HTTPException(status_code=404, detail="State file not found")
-        app.state.agency = Agency.load_from_file(file_path, tools=all_tools)
+        app.state.agency = await Agency.load_from_file(file_path, tools=all_tools)
         return {"status": "started", "from_state_file": req.from_state_file}
     else:
-        workspace_id = req.workspace_id or f"webapi_workspace_{os.urandom(4).hex()}"
+        workspace_id = req.workspace_id or f"webapi_workspace_{secrets.token_hex(4)}"
         app.state.agency = Agency(workspace_id=workspace_id, main_agent_system_prompt=MAIN_AGENT_SYSTEM_PROMPT)
         return {"status": "started", "workspace_id": workspace_id}
 
@@ -160,8 +173,9 @@ async def stop_agency():
     if not hasattr(app.state, "agency") or not app.state.agency:
         raise HTTPException(status_code=400, detail="No active agency")
     agency = app.state.agency
-    # Save state
-    agency.save_to_file(SAVE_DIR)
+    # Save state in the default executor; serializing a large agency would otherwise stall the event loop.
+    # The agency is going away, so write the full state rather than an incremental save
+    await asyncio.get_running_loop().run_in_executor(None, functools.partial(agency.save_to_file, SAVE_DIR, compact=True))
     await agency.shutdown()
     app.state.agency = None
     return {"status": "stopped", "saved": True}